@@ -2,9 +2,12 @@ from django.contrib import admin
 
 from .models import SudokuGame
 from .models import SudokuRecord
+from .models import PuzzlePoolEntry
+from .models import UserSolveCount
 
 # Register your models here.
 
 admin.site.register(SudokuGame)
 admin.site.register(SudokuRecord)
-
+admin.site.register(PuzzlePoolEntry)
+admin.site.register(UserSolveCount)
@@ -0,0 +1,89 @@
+import numpy as np
+from sudoku_app.boardform import CELL_KEYS
+
+# vectorized board operations on uint8 arrays of shape (..., 9, 9), where 0 represents a blank
+# every function works on a single board or on a stack of boards at once
+DIGITS = np.arange(1, 10, dtype=np.uint8)
+ALL_DIGITS = 0x3FE
+
+# convert board strings (see boards.py) into array of shape (len(board_strings), 9, 9)
+def stackBoards(board_strings):
+    return (np.frombuffer(''.join(board_strings).encode('ascii'), dtype=np.uint8) - ord('0')).reshape(-1, 9, 9)
+
+# mask of filled cells whose digit appears more than once in their row, column or box
+def findConflicts(boards):
+    # one_hot[..., r, c, d] is True if cell (r, c) holds digit d + 1
+    one_hot = boards[..., None] == DIGITS
+    row_duplicates = one_hot.sum(axis=-2) > 1
+    col_duplicates = one_hot.sum(axis=-3) > 1
+    boxes = one_hot.reshape(one_hot.shape[:-3] + (3, 3, 3, 3, 9))
+    box_duplicates = boxes.sum(axis=(-4, -2)) > 1
+    duplicated = row_duplicates[..., :, None, :] | col_duplicates[..., None, :, :]
+    duplicated = duplicated | box_duplicates[..., :, None, :, None, :].repeat(3, axis=-4).repeat(3, axis=-2).reshape(duplicated.shape)
+    return (one_hot & duplicated).any(axis=-1)
+
+# mask of cells that differ from the solution (blanks included)
+def findMismatches(boards, solutions):
+    return boards != solutions
+
+# True for each board that is completely filled without conflicts, i.e. every row, column and box
+# contains each digit exactly once, so the digit bits in it add up to ALL_DIGITS
+def isValidSolution(boards):
+    bits = np.left_shift(1, boards, dtype=np.uint16)
+    boxes = bits.reshape(bits.shape[:-2] + (3, 3, 3, 3)).sum(axis=(-3, -1))
+    return (bits.sum(axis=-1) == ALL_DIGITS).all(axis=-1) & (bits.sum(axis=-2) == ALL_DIGITS).all(axis=-1) & (boxes == ALL_DIGITS).all(axis=(-2, -1))
+
+# True for each board that matches its solution
+def isSolved(boards, solutions):
+    return (boards == solutions).all(axis=(-2, -1))
+
+# True for each board whose filled cells all match the corresponding cells of other_boards
+def agreesWith(boards, other_boards):
+    return ((boards == 0) | (boards == other_boards)).all(axis=(-2, -1))
+
+# board pasted as text, one character per cell in board order with digits 1-9 and '0' or '.' for blanks, ignoring
+# whitespace and the '|', '+' and '-' characters of grid drawings, as array of shape (9, 9)
+# raises ValueError if anything else is in the text or it does not have 81 cells
+def parseBoardText(text):
+    chars = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+    chars = chars[~np.isin(chars, np.frombuffer(b' \t\r\n|+-', dtype=np.uint8))]
+    chars = np.where(chars == ord('.'), ord('0'), chars)
+    if len(chars) != 81 or ((chars < ord('0')) | (chars > ord('9'))).any():
+        raise ValueError('Board must have 81 cells of digits 1-9, with 0 or . for blanks')
+    return (chars - ord('0')).reshape(9, 9)
+
+# board from the cell inputs of a form, as array of shape (9, 9) (the vectorized counterpart of fillCurrentBoard in
+# helper.py for a board without locked positions), missing and invalid inputs are blanks
+def parseBoardInputs(post_request_data):
+    values = np.array([post_request_data.get(name, '') for name in CELL_KEYS], dtype=str)
+    # valid inputs are a single character, so the code point of the first character of each value is its digit
+    digits = values.astype('U1').view(np.uint32) - ord('0')
+    valid = (np.char.str_len(values) == 1) & (digits < 10)
+    return np.where(valid, digits, 0).astype(np.uint8).reshape(9, 9)
+
+# single board wrapper around the functions above
+class BoardArray:
+    def __init__(self, cells):
+        self.cells = cells
+
+    @classmethod
+    def fromString(cls, board_string):
+        return cls(stackBoards([board_string])[0])
+
+    def toString(self):
+        return (self.cells.reshape(81) + ord('0')).tobytes().decode('ascii')
+
+    def toList(self):
+        return self.cells.reshape(81).tolist()
+
+    def conflicts(self):
+        return findConflicts(self.cells)
+
+    def mismatches(self, solution):
+        return findMismatches(self.cells, solution.cells)
+
+    def isSolved(self, solution):
+        return bool(isSolved(self.cells, solution.cells))
+
+    def isValidSolution(self):
+        return bool(isValidSolution(self.cells))
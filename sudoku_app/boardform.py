@@ -0,0 +1,19 @@
+# parsing of the board posted by the puzzle form, either as one input per blank cell named by its coordinate
+# (see grid.html) or as a single 'board' field of 81 characters in board order (locked cells are sent too and ignored)
+
+# name of the input of each cell, in board order
+CELL_KEYS = tuple(f'({i},{j})' for i in range(0, 9) for j in range(0, 9))
+
+# value of every valid input, anything else (including '') is coerced into a blank
+CELL_VALUES = {str(val): val for val in range(0, 10)}
+
+# name of the field holding the whole board
+BOARD_FIELD = 'board'
+
+# current board from posted form data, where locked positions (filled in the initial board) always keep their initial
+# value and cells that were not sent (the disabled inputs of locked positions) fall back to the initial board
+def parseBoardForm(initial_board_array, post_request_data):
+    board = post_request_data.get(BOARD_FIELD)
+    if board is not None and len(board) == 81:
+        return [initial or CELL_VALUES.get(char, 0) for initial, char in zip(initial_board_array, board)]
+    return [initial or CELL_VALUES.get(post_request_data.get(key), 0) for key, initial in zip(CELL_KEYS, initial_board_array)]
@@ -0,0 +1,20 @@
+# boards are stored as strings of 81 digits in row-major order, with 0 representing a blank,
+# and are worked on as flat lists of 81 ints
+DECODE_TABLE = bytes.maketrans(b'0123456789', bytes(range(10)))
+ENCODE_TABLE = bytes.maketrans(bytes(range(10)), b'0123456789')
+
+# checks that board_string is a board string as stored, i.e. 81 digits
+def isBoardString(board_string):
+    return isinstance(board_string, str) and len(board_string) == 81 and board_string.isascii() and board_string.isdigit()
+
+# convert stored board string into flat list of ints
+def decodeBoard(board_string):
+    return list(board_string.encode('ascii').translate(DECODE_TABLE))
+
+# convert flat list of ints into board string for storage
+def encodeBoard(flat_board):
+    return bytes(flat_board).translate(ENCODE_TABLE).decode('ascii')
+
+# number of filled cells of stored board string
+def countFilled(board_string):
+    return 81 - board_string.count('0')
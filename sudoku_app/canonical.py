@@ -0,0 +1,64 @@
+import hashlib
+from itertools import permutations, product
+import numpy as np
+from sudoku_app.boards import encodeBoard
+
+# the 1296 column orders that keep the board valid: the three stacks in any order, and the columns of each stack in any order
+COLUMN_ORDERS = np.array([
+    [stack * 3 + col for stack, cols in zip(stack_order, col_orders) for col in cols]
+    for stack_order in permutations(range(3))
+    for col_orders in product(permutations(range(3)), repeat=3)
+], dtype=np.int8)
+
+# place value of each column when a row is read as a 9 digit number, so rows compare as integers
+ROW_WEIGHTS = 10 ** np.arange(8, -1, -1, dtype=np.int64)
+
+# canonical form of a board (flat list of 81 ints, 0 for blanks) under the transformations that map puzzles onto
+# equivalent puzzles: transposition, permuting bands and the rows in them, permuting stacks and the columns in them
+# (rotations and reflections are combinations of these) and relabeling digits
+# it is the lexicographically smallest board string reachable with these, after relabeling the digits in order of first
+# appearance, found by building it one row at a time and only keeping the transformations that give the smallest prefix
+def canonicalForm(board):
+    grid = np.array(board, dtype=np.int8).reshape(9, 9)
+    orientations = np.stack([grid, grid.T])
+    # every state is an orientation and column order, with the rows chosen so far and the digit relabeling they imply
+    # (-1 for digits not seen yet)
+    orientation = np.repeat(np.arange(2), len(COLUMN_ORDERS))
+    columns = np.tile(np.arange(len(COLUMN_ORDERS)), 2)
+    chosen = np.zeros((len(orientation), 0), dtype=np.int8)
+    labels = np.full((len(orientation), 10), -1, dtype=np.int8)
+    labels[:, 0] = 0
+    next_label = np.ones(len(orientation), dtype=np.int8)
+    canonical_rows = []
+    for k in range(9):
+        # candidate rows: at the start of a band any row of an unused band, otherwise the unused rows of the current band
+        if k % 3 == 0:
+            used_bands = (chosen[:, :, None] // 3 == np.arange(9) // 3).any(axis=1)
+            state_index, row = np.nonzero(~used_bands)
+        else:
+            state_index = np.repeat(np.arange(len(chosen)), 3)
+            row = (chosen[:, k - 1, None] // 3 * 3 + np.arange(3)).reshape(-1)
+            unused = ~(chosen[state_index] == row[:, None]).any(axis=1)
+            state_index, row = state_index[unused], row[unused]
+        orientation, columns, chosen = orientation[state_index], columns[state_index], np.concatenate([chosen[state_index], row[:, None].astype(np.int8)], axis=1)
+        labels, next_label = labels[state_index].copy(), next_label[state_index].copy()
+        values = orientations[orientation[:, None], row[:, None], COLUMN_ORDERS[columns]]
+        # relabel digits of the row in order of first appearance, continuing the relabeling of the earlier rows
+        relabeled = np.empty_like(values)
+        states = np.arange(len(values))
+        for col in range(9):
+            value = values[:, col]
+            unseen = labels[states, value] < 0
+            labels[states[unseen], value[unseen]] = next_label[unseen]
+            next_label += unseen
+            relabeled[:, col] = labels[states, value]
+        # keep the states giving the smallest row
+        keys = relabeled.astype(np.int64) @ ROW_WEIGHTS
+        best = keys == keys.min()
+        canonical_rows.append(relabeled[best][0])
+        orientation, columns, chosen, labels, next_label = orientation[best], columns[best], chosen[best], labels[best], next_label[best]
+    return encodeBoard(np.concatenate(canonical_rows).tolist())
+
+# stable hash of the canonical form, equal for boards that are equivalent puzzles
+def canonicalHash(board):
+    return hashlib.sha1(canonicalForm(board).encode('ascii')).hexdigest()
@@ -0,0 +1,79 @@
+import atexit
+import logging
+import threading
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from sudoku_app.models import MoveEvent
+
+logger = logging.getLogger(__name__)
+
+# events waiting to be inserted, and the background thread inserting them (started on first use)
+move_event_buffer = []
+move_event_lock = threading.Lock()
+flush_requested = threading.Event()
+flusher = None
+
+# drop queued events past MOVE_EVENT_BUFFER_LIMIT, so a database that keeps failing can't exhaust memory
+# (called with move_event_lock held)
+def trimMoveEvents():
+    dropped = len(move_event_buffer) - settings.MOVE_EVENT_BUFFER_LIMIT
+    if dropped > 0:
+        del move_event_buffer[settings.MOVE_EVENT_BUFFER_LIMIT:]
+        logger.warning('move event buffer full, dropped %d events', dropped)
+
+# queue (position, value) changes made to a game, returning without touching the database
+# (if MOVE_EVENT_FLUSH_INTERVAL is 0 there is no background thread, and a full buffer is flushed by the caller instead,
+# logging rather than raising a failed flush as the changes have already been saved)
+def recordMoveEvents(game_id, changes):
+    global flusher
+    created_at = timezone.now()
+    with move_event_lock:
+        move_event_buffer.extend(MoveEvent(game_id=game_id, position=position, value=value, created_at=created_at) for position, value in changes)
+        trimMoveEvents()
+        full = len(move_event_buffer) >= settings.MOVE_EVENT_BATCH_SIZE
+        if flusher is None and settings.MOVE_EVENT_FLUSH_INTERVAL > 0:
+            flusher = threading.Thread(target=runFlusher, name='move-event-flusher', daemon=True)
+            flusher.start()
+            # events still queued when the process exits would otherwise be lost
+            atexit.register(flushMoveEvents)
+    if full and flusher is None:
+        tryFlushMoveEvents()
+    elif full:
+        flush_requested.set()
+
+# insert every queued event, returns number of events inserted
+# events are put back at the front of the queue if the insert fails, so they are retried on the next flush
+def flushMoveEvents():
+    with move_event_lock:
+        events = move_event_buffer[:]
+        del move_event_buffer[:]
+    if not events:
+        return 0
+    try:
+        MoveEvent.objects.bulk_create(events, batch_size=settings.MOVE_EVENT_BATCH_SIZE)
+    except Exception:
+        with move_event_lock:
+            move_event_buffer[:0] = events
+            trimMoveEvents()
+        raise
+    return len(events)
+
+# flushMoveEvents for callers that carry on without the events being inserted, returns number of events inserted
+def tryFlushMoveEvents():
+    try:
+        return flushMoveEvents()
+    except Exception:
+        logger.exception('move event flush failed, %d events queued', len(move_event_buffer))
+        return 0
+
+# flush whenever the buffer fills up, and at least every MOVE_EVENT_FLUSH_INTERVAL seconds
+def runFlusher():
+    while True:
+        flush_requested.wait(settings.MOVE_EVENT_FLUSH_INTERVAL)
+        flush_requested.clear()
+        try:
+            tryFlushMoveEvents()
+        finally:
+            # this thread's connection is not recycled by the request cycle
+            close_old_connections()
@@ -0,0 +1,59 @@
+import random
+from sudoku_app.solver import ALL_DIGITS, ROW_OF, COL_OF, BOX_OF, _prepare, _search, randomSolution
+
+# number of clues the digger aims to leave for each difficulty
+CLUE_TARGETS = {'easy': 40, 'medium': 32, 'hard': 26}
+
+# checks if blanking pos keeps the puzzle unique, i.e. no other digit at pos leads to a solution
+# rows/cols/boxes/empties are the masks and blanks of puzzle as kept up to date by digPuzzle, and are left as they were
+def _isRemovable(puzzle, pos, rows, cols, boxes, empties):
+    r, c, b = ROW_OF[pos], COL_OF[pos], BOX_OF[pos]
+    value = 1 << puzzle[pos]
+    rows[r] ^= value
+    cols[c] ^= value
+    boxes[b] ^= value
+    alternatives = ALL_DIGITS & ~(rows[r] | cols[c] | boxes[b]) & ~value
+    removable = True
+    while alternatives and removable:
+        bit = alternatives & -alternatives
+        alternatives ^= bit
+        rows[r] |= bit
+        cols[c] |= bit
+        boxes[b] |= bit
+        removable = not _search(puzzle, rows, cols, boxes, empties, 1, [], None)
+        rows[r] ^= bit
+        cols[c] ^= bit
+        boxes[b] ^= bit
+    rows[r] |= value
+    cols[c] |= value
+    boxes[b] |= value
+    return removable
+
+# blank out cells of a solved board in random order while the puzzle keeps a unique solution
+# the masks are built once and updated as cells are blanked rather than rebuilt for every cell
+def digPuzzle(solution, clues, rng=None):
+    rng = rng or random.Random()
+    puzzle = list(solution)
+    rows, cols, boxes, empties = _prepare(puzzle)
+    positions = list(range(81))
+    rng.shuffle(positions)
+    remaining = 81
+    for pos in positions:
+        if remaining <= clues:
+            break
+        if _isRemovable(puzzle, pos, rows, cols, boxes, empties):
+            bit = 1 << puzzle[pos]
+            rows[ROW_OF[pos]] ^= bit
+            cols[COL_OF[pos]] ^= bit
+            boxes[BOX_OF[pos]] ^= bit
+            empties.append(pos)
+            puzzle[pos] = 0
+            remaining -= 1
+    return puzzle
+
+# create a puzzle of given difficulty and its solution as flat lists of 81 ints
+def generatePuzzle(difficulty='easy', rng=None):
+    rng = rng or random.Random()
+    solution = randomSolution(rng)
+    puzzle = digPuzzle(solution, CLUE_TARGETS.get(difficulty, CLUE_TARGETS['easy']), rng)
+    return puzzle, solution
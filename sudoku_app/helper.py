@@ -1,90 +1,290 @@
-import requests
+from django.conf import settings
 from django.contrib.auth.models import User
-from sudoku_app.models import SudokuRecord
-from django.db import connection
-from urllib.parse import quote
-import re
-
-# credit to https://github.com/bertoort/sugoku for sudoku api
-# retrieve sudoku puzzle and solution
-def generateSudoku(difficulty='easy'):
-    sudoku_board = requests.get(f'https://sugoku.herokuapp.com/board?difficulty={difficulty}').json()
-    encoded_board = encodeParams(sudoku_board)
-    solution_headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    sudoku_solution = requests.post('https://sugoku.herokuapp.com/solve', data=encoded_board, headers=solution_headers).json()
-    return {'puzzle': sudoku_board['board'], 'solution': sudoku_solution['solution']}
-
-# see https://github.com/bertoort/sugoku
-def encodeBoard(board): 
-    result = ''
-    for count, row in enumerate(board):
-        end = '' if count == len(board) - 1 else '%2C'
-        string_row = ','.join(map(lambda num: str(num), row))
-        encodedRow = f'%5B{quote(string_row)}%5D{end}'
-        result = result + encodedRow
-    return result
-
-# see https://github.com/bertoort/sugoku
-def encodeParams(params):
-    return '&'.join(map(lambda key : key + '=' + f'%5B{encodeBoard(params[key])}%5D', params.keys()))
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from sudoku_app.models import SudokuGame, SudokuRecord, UserSolveCount, MoveEvent
+from sudoku_app.generator import generatePuzzle
+from sudoku_app.boards import decodeBoard, encodeBoard, countFilled
+from sudoku_app.rating import ratePuzzle, techniqueDifficulty
+from sudoku_app.canonical import canonicalHash
+from sudoku_app.events import recordMoveEvents, flushMoveEvents
+from sudoku_app.solveservice import solveBoard
+from sudoku_app.boardform import parseBoardForm
+from django.db import connection, transaction
+from django.db.models import Aggregate, Count, F, FloatField
+from django.utils import timezone
+import json
+import time
+
+# UserSolveCount column holding number of puzzles solved for each difficulty
+SOLVE_COUNT_FIELDS = {'easy': 'easy_solved', 'medium': 'medium_solved', 'hard': 'hard_solved'}
+
+# number of times a batch of moves is reapplied when another request saves the board first
+SAVE_ATTEMPTS = 3
+
+# fewest clues a puzzle with a unique solution can have
+MIN_CLUES = 17
+
+# cache key of counter that is part of every leaderboard cache key, bumping it invalidates all of them
+LEADERBOARD_VERSION_KEY = 'leaderboard:version'
+
+# cache key of median solve times, which expire on their own rather than with the leaderboard
+MEDIAN_SOLVE_TIMES_KEY = 'median-solve-times'
+
+# generate sudoku puzzle and solution locally (see generator.py), encoded for storage along with its rating (see rating.py)
+# and, if hashed, its canonical hash (see canonical.py)
+# hashing roughly doubles the time taken, so puzzles generated while a request waits leave the hash to hash_puzzles
+def generateSudoku(difficulty='easy', hashed=False):
+    puzzle, solution = generatePuzzle(difficulty)
+    rating, technique, _ = ratePuzzle(puzzle, solution)
+    return {'puzzle': encodeBoard(puzzle), 'solution': encodeBoard(solution), 'rating': rating, 'technique': technique, 'hash': canonicalHash(puzzle) if hashed else None}
+
+# rate encoded puzzle with given solution, returns (rating, hardest technique)
+def rateBoard(puzzle, solution):
+    return ratePuzzle(decodeBoard(puzzle), decodeBoard(solution))[:2]
+
+# canonical hash of encoded puzzle
+def hashBoard(puzzle):
+    return canonicalHash(decodeBoard(puzzle))
+
+# ratings already computed for games of equivalent puzzles, as {canonical hash: (rating, hardest technique)}
+def getKnownRatings(canonical_hashes):
+    games = SudokuGame.objects.filter(canonical_hash__in=canonical_hashes, rating__isnull=False).values_list('canonical_hash', 'rating', 'rating_technique')
+    return {canonical_hash: (rating, technique) for canonical_hash, rating, technique in games}
+
+# check that a submitted puzzle (BoardArray) has exactly one solution, searching at most CUSTOM_PUZZLE_NODE_LIMIT nodes
+# in the solve service (cheap checks that rule out a unique solution come first, so most bad submissions are rejected
+# without searching)
+# returns puzzle data like generateSudoku, with the difficulty it was rated as, or raises ValueError explaining why
+# the puzzle was rejected
+def verifyCustomPuzzle(board):
+    if board.conflicts().any():
+        raise ValueError('The puzzle has the same number twice in a row, column or box')
+    if (board.cells != 0).sum() < MIN_CLUES:
+        raise ValueError(f'The puzzle needs at least {MIN_CLUES} numbers to have only one solution')
+    puzzle = board.toString()
+    result = solveBoard(puzzle, max_nodes=settings.CUSTOM_PUZZLE_NODE_LIMIT)
+    solutions, solution = result['solutions'], result['solution']
+    if solutions is None:
+        raise ValueError('The puzzle is too hard to check, try adding more numbers')
+    if solutions == 0:
+        raise ValueError('The puzzle has no solution')
+    if solutions > 1:
+        raise ValueError('The puzzle has more than one solution')
+    rating, technique = rateBoard(puzzle, solution)
+    return {'puzzle': puzzle, 'solution': solution, 'rating': rating, 'technique': technique, 'hash': canonicalHash(board.toList()), 'difficulty': techniqueDifficulty(technique)}
 
 # create array of booleans indicating if given position in sudoku board should be immutable
 def getLockedPositions(initial_board_array):
-    return [[col != 0 for col in row] for row in initial_board_array]
+    return [val != 0 for val in initial_board_array]
+
+# locked positions never change after a puzzle is created, so they are cached for as long as possible
+def getCachedLockedPositions(puzzle):
+    cache_key = f'puzzle-locked:{puzzle.id}'
+    locked_positions = cache.get(cache_key)
+    if locked_positions is None:
+        locked_positions = getLockedPositions(decodeBoard(puzzle.initial_board))
+        cache.set(cache_key, locked_positions, settings.PUZZLE_CACHE_TIMEOUT)
+    return locked_positions
 
 # create array of booleans indicating if given position in sudoku board matches solution
 def getErrors(current_board_array, solution_board_array):
-    return [[current_board_array[i][j] != solution_board_array[i][j] for j in range(0,9)] for i in range(0,9)]
+    return [current != solution for current, solution in zip(current_board_array, solution_board_array)]
 
 # creates representation of sudoku board based on positions sent by view and positions locked in initially
+# (see boardform.py for the accepted encodings)
 def fillCurrentBoard(initial_board_array, post_request_data):
-    # reg-ex that detects and ignores invalid inputs
-    pattern = re.compile('[0-9]')
-    current_board_array = []
-    for i in range(0,9):
-        current_board_array.append([])
-        for j in range(0,9):
-            # format of coordinate sent by view
-            key = f'({i},{j})'
-            # if the view did not sent a value for this coordinate, then it was in the initial puzzle
-            if key not in post_request_data:
-                val = initial_board_array[i][j]
-            # just coerce invalid inputs into blanks, represented by 0s
-            elif post_request_data[key] == '' or not pattern.fullmatch(post_request_data[key]):
-                val = 0
-            # this indicates valid input and is put into current version of puzzle
-            else:
-                val = int(post_request_data[key])
-            current_board_array[i].append(val)
-    return current_board_array
-
-# fills in the first blank with answer from solution board
-def addHint(current_board_array, solution_board_array):
+    return parseBoardForm(initial_board_array, post_request_data)
+
+# find next hint as (position, value, technique) from hint engine (created with the solution board): a naked or
+# hidden single if one can be deduced, otherwise the first blank filled in from the solution board
+# returns None if the board is full or has wrong entries that must be fixed first (deductions from them could be wrong too)
+def findHint(engine, solution_board_array):
+    if engine.wrong_positions:
+        return None
+    hint = engine.nextHint()
+    if hint is None:
+        blank = next((position for position, val in enumerate(engine.cells) if val == 0), None)
+        return (blank, solution_board_array[blank], 'solution') if blank is not None else None
+    return hint
+
+# render html table of inputs for the board, marking locked positions and (if given) errors
+def renderGrid(current_board_array, locked_positions, errors, solved):
+    rows = []
     for i in range(0,9):
+        row = []
         for j in range(0,9):
-            if current_board_array[i][j] == 0:
-                current_board_array[i][j] = solution_board_array[i][j]
-                return current_board_array
+            position = i * 9 + j
+            val = current_board_array[position]
+            row.append({'row': i, 'col': j, 'value': str(val) if val != 0 else '', 'locked': solved or locked_positions[position], 'error': errors is not None and errors[position] and val != 0})
+        rows.append(row)
+    return render_to_string('sudoku_app/grid.html', {'rows': rows})
+
+# board version a form was rendered with, None if it was not posted
+def getPostedVersion(post_request_data):
+    try:
+        return int(post_request_data['version'])
+    except (KeyError, ValueError):
+        return None
 
-# query that retrieves number of puzzles solved for each difficulty from db
+# store new current board if it is still at expected_version (defaults to the version it was loaded at), bumping the
+# version so cached renderings of the old board are no longer used, along with its progress (filled count, solved_at),
+# with a conditional update that only writes the changed columns and does not lock the row
+# returns False without saving if another request changed the board first
+# the changed cells are queued for the move event log, and the first change is remembered as the first move
+def saveBoard(puzzle, current_board, expected_version=None):
+    expected_version = puzzle.version if expected_version is None else expected_version
+    if expected_version != puzzle.version:
+        return False
+    if current_board == puzzle.current_board:
+        return True
+    changes = {'current_board': current_board, 'version': expected_version + 1, 'filled_count': countFilled(current_board), 'solved_at': timezone.now() if current_board == puzzle.solution_board else None}
+    if puzzle.first_move_at is None:
+        changes['first_move_at'] = timezone.now()
+    if not SudokuGame.objects.filter(pk=puzzle.pk, version=expected_version).update(**changes):
+        return False
+    recordMoveEvents(puzzle.id, [(position, int(new)) for position, (old, new) in enumerate(zip(puzzle.current_board, current_board)) if old != new])
+    for field, value in changes.items():
+        setattr(puzzle, field, value)
+    return True
+
+# parse request body of the form {"moves": [{"row": 0, "col": 0, "value": 5}, ...], "check": false, "hint": false}
+# into (position, value) pairs and the set of extra information requested ("check" for errors, "hint" for next hint)
+# raises ValueError if the body is malformed or a move is out of range
+def parseMoves(body):
+    try:
+        data = json.loads(body)
+        parsed_moves = [(move['row'], move['col'], move['value']) for move in data['moves']]
+        requested = {option for option in ('check', 'hint') if data.get(option, False) is True}
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError('Malformed moves') from e
+    for row, col, value in parsed_moves:
+        if not all(type(num) is int and 0 <= num <= limit for num, limit in ((row, 8), (col, 8), (value, 9))):
+            raise ValueError('Move out of range')
+    return [(row * 9 + col, value) for row, col, value in parsed_moves], requested
+
+# apply moves to current board, ignoring positions locked in initially, returns positions that changed
+def applyMoves(initial_board_array, current_board_array, moves):
+    changed_positions = []
+    for position, value in moves:
+        if initial_board_array[position] == 0 and current_board_array[position] != value:
+            current_board_array[position] = value
+            changed_positions.append(position)
+    return changed_positions
+
+# record solve for leaderboard purposes, updating solve counts the first time a puzzle is solved
+# (custom puzzles are not counted, as their players choose how hard they are)
+def recordSolve(puzzle):
+    if puzzle.custom:
+        return False
+    with transaction.atomic():
+        solve_seconds = (puzzle.solved_at - puzzle.created_at).total_seconds() if puzzle.created_at is not None else None
+        _, created = SudokuRecord.objects.get_or_create(puzzle_id=puzzle.id, defaults={'difficulty': puzzle.difficulty, 'user_id': puzzle.user_id, 'solved_at': puzzle.solved_at, 'solve_seconds': solve_seconds})
+        if created:
+            UserSolveCount.objects.get_or_create(user_id=puzzle.user_id)
+            increments = {'total_solved': F('total_solved') + 1}
+            if puzzle.difficulty in SOLVE_COUNT_FIELDS:
+                field = SOLVE_COUNT_FIELDS[puzzle.difficulty]
+                increments[field] = F(field) + 1
+            UserSolveCount.objects.filter(user_id=puzzle.user_id).update(**increments)
+            transaction.on_commit(invalidateLeaderboard)
+    return created
+
+# recompute every user's solve counts from SudokuRecord
+def rebuildSolveCounts():
+    solve_counts = {}
+    for user_id, difficulty, total in SudokuRecord.objects.values_list('user_id', 'difficulty').annotate(total=Count('puzzle_id')).order_by():
+        solve_count = solve_counts.setdefault(user_id, UserSolveCount(user_id=user_id))
+        solve_count.total_solved += total
+        if difficulty in SOLVE_COUNT_FIELDS:
+            setattr(solve_count, SOLVE_COUNT_FIELDS[difficulty], total)
+    with transaction.atomic():
+        UserSolveCount.objects.all().delete()
+        UserSolveCount.objects.bulk_create(solve_counts.values(), batch_size=1000)
+        transaction.on_commit(invalidateLeaderboard)
+    return len(solve_counts)
+
+# retrieves number of puzzles solved for each difficulty
 def getPuzzleStats(user):
-    with connection.cursor() as c:
-        sudoku_record_table_name = SudokuRecord.objects.model._meta.db_table
-        user_table_name = User.objects.model._meta.db_table
-        query = f"SELECT difficulty, COUNT(difficulty) as total FROM {sudoku_record_table_name} INNER JOIN {user_table_name} ON {sudoku_record_table_name}.user_id = {user_table_name}.id WHERE username='{user.username}' GROUP BY difficulty"
-        c.execute(query)
-        results = dict(c.fetchall())
-        return results
-
-# query that retrieves number of puzzles each person has solved from db
-def getLeaderboard():
-    with connection.cursor() as c:
-        sudoku_record_table_name = SudokuRecord.objects.model._meta.db_table
-        user_table_name = User.objects.model._meta.db_table
-        query = f"SELECT username, COUNT(difficulty) as total FROM {sudoku_record_table_name} INNER JOIN {user_table_name} ON {sudoku_record_table_name}.user_id = {user_table_name}.id GROUP BY username ORDER BY total DESC;"
-        c.execute(query)
-        results = dict(c.fetchall())
-        return results
+    solve_count = UserSolveCount.objects.filter(user=user).first()
+    if solve_count is None:
+        return {}
+    return {difficulty: getattr(solve_count, field) for difficulty, field in SOLVE_COUNT_FIELDS.items()}
+
+# moves made to a game in order, as (milliseconds since the game was created, position, value)
+# (queued events are flushed first so the most recent moves are included)
+def getReplay(puzzle):
+    flushMoveEvents()
+    events = list(MoveEvent.objects.filter(game_id=puzzle.id).order_by('id').values_list('created_at', 'position', 'value'))
+    if not events:
+        return []
+    start = puzzle.created_at or events[0][0]
+    return [(round((created_at - start).total_seconds() * 1000), position, value) for created_at, position, value in events]
+
+# median of a column, only supported by PostgreSQL
+class Median(Aggregate):
+    function = 'PERCENTILE_CONT'
+    template = '%(function)s(0.5) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+# median seconds taken to solve a puzzle of each difficulty (None if there are no timed solves), computed by the
+# database where it supports percentiles, otherwise by reading the middle rows of the (difficulty, solve_seconds) index
+# (cached for MEDIAN_SOLVE_TIMES_CACHE_TIMEOUT, as every solve would invalidate a copy cached with the leaderboard)
+def getMedianSolveTimes():
+    medians = cache.get(MEDIAN_SOLVE_TIMES_KEY)
+    if medians is None:
+        records = SudokuRecord.objects.filter(solve_seconds__isnull=False)
+        if connection.vendor == 'postgresql':
+            medians = dict(records.values_list('difficulty').annotate(median=Median('solve_seconds')).order_by())
+        else:
+            medians = {}
+            for difficulty, total in records.values_list('difficulty').annotate(total=Count('puzzle_id')).order_by():
+                middle = list(records.filter(difficulty=difficulty).order_by('solve_seconds').values_list('solve_seconds', flat=True)[(total - 1) // 2:total // 2 + 1])
+                medians[difficulty] = sum(middle) / len(middle)
+        medians = {difficulty: medians.get(difficulty) for difficulty in SOLVE_COUNT_FIELDS}
+        cache.set(MEDIAN_SOLVE_TIMES_KEY, medians, settings.MEDIAN_SOLVE_TIMES_CACHE_TIMEOUT)
+    return medians
+
+# current leaderboard cache version (started from a timestamp so it never repeats after cache eviction)
+def getLeaderboardVersion():
+    return cache.get_or_set(LEADERBOARD_VERSION_KEY, time.time_ns, None)
+
+# makes every cached leaderboard page and rank stale
+def invalidateLeaderboard():
+    try:
+        cache.incr(LEADERBOARD_VERSION_KEY)
+    except ValueError:
+        getLeaderboardVersion()
+
+# retrieves one page of (rank, username, total) rows of users ordered by puzzles solved, and whether there is a next page
+# users with the same total share a rank
+def getLeaderboard(page=1, page_size=25):
+    cache_key = f'leaderboard:{getLeaderboardVersion()}:page:{page}:{page_size}'
+    leaderboard = cache.get(cache_key)
+    if leaderboard is None:
+        offset = (page - 1) * page_size
+        # fetch one extra row to find out if there is another page
+        scores = list(UserSolveCount.objects.filter(total_solved__gt=0).order_by('-total_solved', 'user_id').values_list('user__username', 'total_solved')[offset:offset + page_size + 1])
+        rows = []
+        for position, (username, total) in enumerate(scores[:page_size]):
+            if position == 0:
+                rank = UserSolveCount.objects.filter(total_solved__gt=total).count() + 1
+            elif total != rows[-1][2]:
+                rank = offset + position + 1
+            rows.append((rank, username, total))
+        leaderboard = {'rows': rows, 'has_next': len(scores) > page_size}
+        cache.set(cache_key, leaderboard, settings.LEADERBOARD_CACHE_TIMEOUT)
+    return leaderboard
+
+# retrieves (rank, total) of given user on the leaderboard, or None if they have not solved a puzzle
+def getUserRank(user):
+    cache_key = f'leaderboard:{getLeaderboardVersion()}:user:{user.id}'
+    user_rank = cache.get(cache_key)
+    if user_rank is None:
+        total = UserSolveCount.objects.filter(user=user, total_solved__gt=0).values_list('total_solved', flat=True).first()
+        user_rank = (UserSolveCount.objects.filter(total_solved__gt=total).count() + 1, total) if total is not None else ()
+        cache.set(cache_key, user_rank, settings.LEADERBOARD_CACHE_TIMEOUT)
+    return user_rank or None
 
 def tryCreateUser(post_request_data):
     email, username, password = post_request_data['email'], post_request_data['username'], post_request_data['password']
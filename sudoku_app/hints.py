@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+from sudoku_app.solver import ALL_DIGITS, ROW_OF, COL_OF, BOX_OF, BIT_COUNT, BIT_DIGIT
+
+# units are numbered 0-8 for rows, 9-17 for columns and 18-26 for boxes
+UNITS_OF = tuple((ROW_OF[pos], 9 + COL_OF[pos], 18 + BOX_OF[pos]) for pos in range(81))
+UNIT_CELLS = tuple(tuple(pos for pos in range(81) if unit in UNITS_OF[pos]) for unit in range(27))
+PEERS = tuple(tuple(sorted({peer for unit in UNITS_OF[pos] for peer in UNIT_CELLS[unit]} - {pos})) for pos in range(81))
+
+# number of puzzles whose hint engines are kept between requests
+ENGINE_CACHE_SIZE = 256
+
+# keeps candidate bitmasks for every blank of a board and updates them incrementally as values change,
+# along with the sets of cells that can be deduced next (and, given the solution, the cells filled in wrong),
+# so finding a hint does not rescan the board
+class HintEngine:
+    def __init__(self, board, solution=None):
+        self.cells = list(board)
+        self.solution = solution
+        self.wrong_positions = {pos for pos, val in enumerate(self.cells) if val != 0 and solution is not None and val != solution[pos]}
+        # number of cells in each unit holding each digit, and bitmask of digits present in each unit
+        self.placed = [[0] * 10 for _ in range(27)]
+        self.used = [0] * 27
+        for pos, val in enumerate(self.cells):
+            if val != 0:
+                for unit in UNITS_OF[pos]:
+                    self.placed[unit][val] += 1
+                    self.used[unit] |= 1 << val
+        # number of blanks in each unit that have each digit as a candidate
+        self.candidate_counts = [[0] * 10 for _ in range(27)]
+        self.candidates = [0] * 81
+        # blanks with exactly one candidate, and (unit, digit) pairs with exactly one possible cell
+        self.naked_singles = set()
+        self.hidden_singles = set()
+        for pos in range(81):
+            self.updateCandidates(pos)
+
+    # recompute the candidates of pos, keeping the candidate counts and single sets in sync
+    def updateCandidates(self, pos):
+        old_mask = self.candidates[pos]
+        if self.cells[pos] != 0:
+            new_mask = 0
+        else:
+            r, c, b = UNITS_OF[pos]
+            new_mask = ALL_DIGITS & ~(self.used[r] | self.used[c] | self.used[b])
+        if new_mask == old_mask:
+            return
+        self.candidates[pos] = new_mask
+        if BIT_COUNT[new_mask] == 1:
+            self.naked_singles.add(pos)
+        else:
+            self.naked_singles.discard(pos)
+        changed = old_mask ^ new_mask
+        while changed:
+            bit = changed & -changed
+            changed ^= bit
+            digit = BIT_DIGIT[bit]
+            step = 1 if new_mask & bit else -1
+            for unit in UNITS_OF[pos]:
+                self.candidate_counts[unit][digit] += step
+                if self.candidate_counts[unit][digit] == 1:
+                    self.hidden_singles.add((unit, digit))
+                else:
+                    self.hidden_singles.discard((unit, digit))
+
+    # place value (0 to clear) at pos, only pos and its 20 peers are updated
+    def setValue(self, pos, value):
+        old_value = self.cells[pos]
+        if old_value == value:
+            return
+        for unit in UNITS_OF[pos]:
+            if old_value != 0:
+                self.placed[unit][old_value] -= 1
+                if self.placed[unit][old_value] == 0:
+                    self.used[unit] &= ~(1 << old_value)
+            if value != 0:
+                self.placed[unit][value] += 1
+                self.used[unit] |= 1 << value
+        self.cells[pos] = value
+        if self.solution is not None:
+            if value != 0 and value != self.solution[pos]:
+                self.wrong_positions.add(pos)
+            else:
+                self.wrong_positions.discard(pos)
+        self.updateCandidates(pos)
+        for peer in PEERS[pos]:
+            self.updateCandidates(peer)
+
+    # positions of filled cells whose digit appears more than once in one of their units
+    def conflicts(self):
+        return [pos for pos, val in enumerate(self.cells) if val != 0 and any(self.placed[unit][val] > 1 for unit in UNITS_OF[pos])]
+
+    # next logically deducible cell as (position, value, technique), or None if no single is available
+    def nextHint(self):
+        if self.naked_singles:
+            pos = min(self.naked_singles)
+            return pos, BIT_DIGIT[self.candidates[pos]], 'naked single'
+        if self.hidden_singles:
+            unit, digit = min(self.hidden_singles)
+            bit = 1 << digit
+            for pos in UNIT_CELLS[unit]:
+                if self.candidates[pos] & bit:
+                    return pos, digit, 'hidden single'
+        return None
+
+# bring engine in line with board, only updating the positions that differ
+def syncBoard(engine, board):
+    if engine.cells != board:
+        for pos in range(81):
+            if engine.cells[pos] != board[pos]:
+                engine.setValue(pos, board[pos])
+
+# hint engines of recently hinted puzzles, keyed by puzzle id and holding the board version they reflect
+engine_cache = OrderedDict()
+engine_cache_lock = threading.Lock()
+
+# hint engine for a puzzle, reusing the one kept from an earlier request if the board is unchanged
+# (the engine is taken out of the cache while in use, storeHintEngine puts it back)
+def getHintEngine(puzzle_id, version, board, solution):
+    with engine_cache_lock:
+        cached = engine_cache.pop(puzzle_id, None)
+    return cached[1] if cached is not None and cached[0] == version else HintEngine(board, solution)
+
+# keep engine for the given board version of a puzzle, evicting the least recently used engine if full
+def storeHintEngine(puzzle_id, version, engine):
+    with engine_cache_lock:
+        engine_cache[puzzle_id] = (version, engine)
+        engine_cache.move_to_end(puzzle_id)
+        if len(engine_cache) > ENGINE_CACHE_SIZE:
+            engine_cache.popitem(last=False)
@@ -0,0 +1,176 @@
+import json
+import platform
+import random
+import re
+import statistics
+import time
+import timeit
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from sudoku_app.boards import decodeBoard, encodeBoard, countFilled
+from sudoku_app.generator import generatePuzzle
+from sudoku_app.helper import getLockedPositions, getErrors, fillCurrentBoard, findHint, rebuildSolveCounts
+from sudoku_app.hints import HintEngine
+from sudoku_app.rating import ratePuzzle
+from sudoku_app.canonical import canonicalForm
+from sudoku_app.models import SudokuGame, SudokuRecord
+
+# number of distinct puzzles the seeded games are drawn from
+SEED_PUZZLES = 20
+
+# cache used while benchmarking views, in place of the configured one
+BENCHMARK_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}}
+
+# fillCurrentBoard as it was before boardform.py (building every key and matching a regex per cell), kept as a baseline
+def legacyFillCurrentBoard(initial_board_array, post_request_data):
+    pattern = re.compile('[0-9]')
+    current_board_array = []
+    for i in range(0,9):
+        for j in range(0,9):
+            key = f'({i},{j})'
+            if key not in post_request_data:
+                val = initial_board_array[i * 9 + j]
+            elif post_request_data[key] == '' or not pattern.fullmatch(post_request_data[key]):
+                val = 0
+            else:
+                val = int(post_request_data[key])
+            current_board_array.append(val)
+    return current_board_array
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks board helpers and the puzzle views against a freshly seeded test database, printing results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='number of users to seed')
+        parser.add_argument('--games-per-user', type=int, default=3, help='number of games to seed for each user')
+        parser.add_argument('--requests', type=int, default=50, help='number of requests made to each view')
+        parser.add_argument('--output', help='file to write results to instead of stdout')
+        parser.add_argument('--baseline', help='results of an earlier run to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='fractional slowdown against the baseline that counts as a regression')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        puzzles = [generatePuzzle(difficulty, rng) for difficulty in ('easy', 'medium', 'hard') for _ in range(SEED_PUZZLES // 3 + 1)]
+        results = {
+            'environment': {'python': platform.python_version(), 'django': django.get_version(), 'users': options['users'], 'games_per_user': options['games_per_user']},
+            'functions': self.benchmarkFunctions(puzzles),
+        }
+        # views are benchmarked against a throwaway test database and a local cache so real data is never touched
+        # (the uncached leaderboard case clears the cache)
+        setup_test_environment()
+        old_database_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                results['environment']['database'] = connection.vendor
+                self.seed(puzzles, options['users'], options['games_per_user'], rng)
+                results['views'] = self.benchmarkViews(options['requests'])
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+            teardown_test_environment()
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['tolerance'])
+
+    # microseconds per call (best of 5 runs) of the helpers used on every puzzle request
+    def benchmarkFunctions(self, puzzles):
+        puzzle, solution = puzzles[0]
+        initial_board, solution_board = encodeBoard(puzzle), encodeBoard(solution)
+        engine = HintEngine(puzzle, solution)
+        blank = puzzle.index(0)
+        post_data = {f'({i},{j})': str(solution[i * 9 + j]) for i in range(0, 9) for j in range(0, 9) if puzzle[i * 9 + j] == 0}
+        compact_post_data = {'board': solution_board}
+        cases = {
+            'decodeBoard': lambda: decodeBoard(initial_board),
+            'encodeBoard': lambda: encodeBoard(solution),
+            'getLockedPositions': lambda: getLockedPositions(puzzle),
+            'getErrors': lambda: getErrors(puzzle, solution),
+            'fillCurrentBoard': lambda: fillCurrentBoard(puzzle, post_data),
+            'fillCurrentBoard compact': lambda: fillCurrentBoard(puzzle, compact_post_data),
+            'fillCurrentBoard legacy': lambda: legacyFillCurrentBoard(puzzle, post_data),
+            'HintEngine': lambda: HintEngine(puzzle, solution),
+            'HintEngine.setValue': lambda: engine.setValue(blank, solution[blank]) or engine.setValue(blank, 0),
+            'findHint': lambda: findHint(engine, solution),
+            'ratePuzzle': lambda: ratePuzzle(puzzle, solution),
+            'canonicalForm': lambda: canonicalForm(puzzle),
+            'decodeBoard+getErrors': lambda: getErrors(decodeBoard(initial_board), decodeBoard(solution_board)),
+        }
+        results = {}
+        for name, case in cases.items():
+            timer = timeit.Timer(case)
+            number, _ = timer.autorange()
+            results[name] = {'us_per_call': min(timer.repeat(5, number)) / number * 1e6}
+        return results
+
+    def seed(self, puzzles, user_count, games_per_user, rng):
+        User.objects.bulk_create([User(username=f'benchmark{i}', password='!') for i in range(user_count)], batch_size=1000)
+        users = list(User.objects.filter(username__startswith='benchmark'))
+        games = []
+        for user in users:
+            for _ in range(games_per_user):
+                puzzle, solution = rng.choice(puzzles)
+                initial_board, solution_board = encodeBoard(puzzle), encodeBoard(solution)
+                # roughly a third of the games are solved
+                current_board = solution_board if rng.random() < 0.3 else initial_board
+                games.append(SudokuGame(initial_board=initial_board, current_board=current_board, solution_board=solution_board, filled_count=countFilled(current_board), solved_at=timezone.now() if current_board == solution_board else None, difficulty='easy', user=user))
+        SudokuGame.objects.bulk_create(games, batch_size=1000)
+        solved_games = SudokuGame.objects.filter(solved_at__isnull=False).values_list('id', 'difficulty', 'user_id')
+        SudokuRecord.objects.bulk_create([SudokuRecord(puzzle_id=game_id, difficulty=difficulty, user_id=user_id) for game_id, difficulty, user_id in solved_games.iterator()], batch_size=1000)
+        rebuildSolveCounts()
+
+    # latency percentiles and query count of each view, requested by a user with an unsolved game
+    def benchmarkViews(self, request_count):
+        game = SudokuGame.objects.filter(solved_at__isnull=True).first()
+        client = Client()
+        client.force_login(game.user)
+        post_data = {f'({i},{j})': '' for i in range(0, 9) for j in range(0, 9) if game.initial_board[i * 9 + j] == '0'}
+        cases = {
+            'puzzle': lambda: client.get(f'/puzzles/{game.id}/'),
+            'save_puzzle': lambda: client.post(f'/puzzles/{game.id}/save', post_data),
+            'check_puzzle': lambda: client.post(f'/puzzles/{game.id}/check', post_data),
+            'puzzles': lambda: client.get('/puzzles/'),
+            'display_leaderboard': lambda: client.get('/puzzles/leaderboard'),
+            'display_leaderboard_uncached': lambda: cache.clear() or client.get('/puzzles/leaderboard'),
+        }
+        results = {}
+        for name, case in cases.items():
+            durations = []
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(request_count):
+                    start = time.perf_counter()
+                    response = case()
+                    durations.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise CommandError(f'{name} responded with {response.status_code}')
+            durations.sort()
+            results[name] = {
+                'ms_mean': statistics.mean(durations),
+                'ms_p50': durations[len(durations) // 2],
+                'ms_p95': durations[min(len(durations) - 1, round(0.95 * (len(durations) - 1)))],
+                'queries_per_request': len(queries) / request_count,
+            }
+        return results
+
+    # report timings that got slower than the baseline by more than the tolerance
+    def compare(self, results, baseline_path, tolerance):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = []
+        for section, metric in (('functions', 'us_per_call'), ('views', 'ms_p50')):
+            for name, values in results.get(section, {}).items():
+                previous = baseline.get(section, {}).get(name)
+                if previous and values[metric] > previous[metric] * (1 + tolerance):
+                    regressions.append(f'{section}.{name}: {previous[metric]:.2f} -> {values[metric]:.2f} {metric}')
+        if regressions:
+            raise CommandError('Regressions against baseline:\n' + '\n'.join(regressions))
@@ -0,0 +1,31 @@
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from sudoku_app.models import SudokuGame
+from sudoku_app.pool import bulkCreatePuzzles
+
+
+class Command(BaseCommand):
+    help = 'Creates puzzles of a difficulty for the given users (or every user), generating them in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('difficulty', choices=[difficulty for difficulty, _ in SudokuGame.DIFFICULTIES])
+        parser.add_argument('--count', type=int, default=1, help='number of puzzles to create for each user')
+        parser.add_argument('--user', action='append', dest='usernames', help='username to create puzzles for (repeatable)')
+        parser.add_argument('--all-users', action='store_true', help='create puzzles for every user')
+        parser.add_argument('--workers', type=int, help='number of generator processes (defaults to number of CPUs)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='number of games inserted per query')
+
+    def handle(self, *args, **options):
+        if options['all_users']:
+            users = list(User.objects.all())
+        elif options['usernames']:
+            users = list(User.objects.filter(username__in=options['usernames']))
+            missing = set(options['usernames']) - {user.username for user in users}
+            if missing:
+                raise CommandError(f'Unknown users: {", ".join(sorted(missing))}')
+        else:
+            raise CommandError('Pass --user or --all-users')
+        with ProcessPoolExecutor(options['workers']) as executor:
+            created = bulkCreatePuzzles(executor, users, options['difficulty'], options['count'], options['chunk_size'])
+        self.stdout.write(f'Created {created} {options["difficulty"]} puzzles for {len(users)} users')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from sudoku_app.transfer import exportLines, openTransferFile
+
+
+class Command(BaseCommand):
+    help = 'Streams every game and solve record to an export file (gzip compressed if its name ends in .gz)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='file to write')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='number of rows read from the database at a time')
+
+    def handle(self, *args, **options):
+        lines = 0
+        with openTransferFile(options['path'], 'w') as f:
+            for line in exportLines(options['chunk_size']):
+                f.write(line + '\n')
+                lines += 1
+        self.stdout.write(f'Exported {lines} lines to {options["path"]}')
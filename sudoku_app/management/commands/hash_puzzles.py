@@ -0,0 +1,37 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.core.management.base import BaseCommand
+from sudoku_app.helper import hashBoard
+from sudoku_app.models import SudokuGame, PuzzlePoolEntry
+from sudoku_app.pool import GENERATION_CHUNKSIZE
+
+
+class Command(BaseCommand):
+    help = 'Computes the canonical hash of stored games and pool entries that have none yet, in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='recompute hashes that are already set')
+        parser.add_argument('--workers', type=int, help='number of hashing processes (defaults to number of CPUs)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='number of puzzles hashed and updated at a time')
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(options['workers']) as executor:
+            for model in (SudokuGame, PuzzlePoolEntry):
+                hashed = self.hash(executor, model, options['all'], options['chunk_size'])
+                self.stdout.write(f'Hashed {hashed} {model.__name__} rows')
+
+    # hash rows of model chunk by chunk, each chunk split across the processes of executor
+    def hash(self, executor, model, rehash, chunk_size):
+        queryset = model.objects.all() if rehash else model.objects.filter(canonical_hash__isnull=True)
+        rows = queryset.order_by('id').values_list('id', 'initial_board').iterator(chunk_size=chunk_size)
+        hashed = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            ids, initial_boards = zip(*chunk)
+            hashes = executor.map(hashBoard, initial_boards, chunksize=GENERATION_CHUNKSIZE)
+            objects = [model(id=row_id, canonical_hash=canonical_hash) for row_id, canonical_hash in zip(ids, hashes)]
+            model.objects.bulk_update(objects, ['canonical_hash'])
+            hashed += len(objects)
+        return hashed
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from sudoku_app.helper import rebuildSolveCounts
+from sudoku_app.transfer import importLines, openTransferFile
+
+
+class Command(BaseCommand):
+    help = 'Imports games and solve records from a file written by export_games, keeping their ids'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='file to read')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='number of rows inserted per transaction')
+        parser.add_argument('--create-users', action='store_true', help='create users that do not exist yet (with unusable passwords)')
+        parser.add_argument('--skip-existing', action='store_true', help='skip rows whose id already exists, e.g. to resume an import')
+
+    def handle(self, *args, **options):
+        try:
+            with openTransferFile(options['path'], 'r') as f:
+                counts = importLines(f, options['chunk_size'], options['create_users'], options['skip_existing'])
+        except ValueError as e:
+            raise CommandError(e)
+        # solve counts are derived from the records
+        rebuildSolveCounts()
+        self.stdout.write(', '.join(f'Imported {total} {section}' for section, total in counts.items()))
@@ -0,0 +1,45 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.core.management.base import BaseCommand
+from sudoku_app.helper import rateBoard, getKnownRatings
+from sudoku_app.models import SudokuGame, PuzzlePoolEntry
+from sudoku_app.pool import GENERATION_CHUNKSIZE
+
+
+class Command(BaseCommand):
+    help = 'Rates stored games and pool entries that have no rating yet, grading them in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='re-rate puzzles that already have a rating')
+        parser.add_argument('--workers', type=int, help='number of rating processes (defaults to number of CPUs)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='number of puzzles rated and updated at a time')
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(options['workers']) as executor:
+            for model in (SudokuGame, PuzzlePoolEntry):
+                rated = self.rate(executor, model, options['all'], options['chunk_size'])
+                self.stdout.write(f'Rated {rated} {model.__name__} rows')
+
+    # rate rows of model chunk by chunk, each chunk split across the processes of executor
+    # (unless re-rating, puzzles equivalent to an already rated game take that game's rating)
+    def rate(self, executor, model, rerate, chunk_size):
+        queryset = model.objects.all() if rerate else model.objects.filter(rating__isnull=True)
+        rows = queryset.order_by('id').values_list('id', 'initial_board', 'solution_board', 'canonical_hash').iterator(chunk_size=chunk_size)
+        rated = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            known_ratings = getKnownRatings([canonical_hash for *_, canonical_hash in chunk if canonical_hash]) if not rerate else {}
+            unknown = [row for row in chunk if row[3] not in known_ratings]
+            ratings = {}
+            if unknown:
+                ids, initial_boards, solution_boards, _ = zip(*unknown)
+                ratings = dict(zip(ids, executor.map(rateBoard, initial_boards, solution_boards, chunksize=GENERATION_CHUNKSIZE)))
+            objects = []
+            for row_id, _, _, canonical_hash in chunk:
+                rating, technique = ratings[row_id] if row_id in ratings else known_ratings[canonical_hash]
+                objects.append(model(id=row_id, rating=rating, rating_technique=technique))
+            model.objects.bulk_update(objects, ['rating', 'rating_technique'])
+            rated += len(objects)
+        return rated
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from sudoku_app.helper import rebuildSolveCounts
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the per-user solve counts used by statistics and the leaderboard from SudokuRecord'
+
+    def handle(self, *args, **options):
+        users = rebuildSolveCounts()
+        self.stdout.write(f'Rebuilt solve counts for {users} users')
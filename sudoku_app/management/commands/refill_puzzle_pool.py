@@ -0,0 +1,28 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sudoku_app.models import PuzzlePoolEntry
+from sudoku_app.pool import getPoolDepths, refillPool
+
+
+class Command(BaseCommand):
+    help = 'Tops up the pre-generated puzzle pool for each difficulty to a watermark'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watermark', type=int, default=settings.PUZZLE_POOL_WATERMARK, help='number of ready puzzles to keep per difficulty')
+        parser.add_argument('--difficulty', action='append', choices=[difficulty for difficulty, _ in PuzzlePoolEntry.DIFFICULTIES], help='difficulty to refill (defaults to all)')
+        parser.add_argument('--loop', action='store_true', help='keep refilling until interrupted')
+        parser.add_argument('--interval', type=float, default=settings.PUZZLE_POOL_REFILL_INTERVAL, help='seconds to sleep between refills when looping')
+
+    def handle(self, *args, **options):
+        difficulties = options['difficulty'] or [difficulty for difficulty, _ in PuzzlePoolEntry.DIFFICULTIES]
+        while True:
+            for difficulty in difficulties:
+                added = refillPool(difficulty, options['watermark'])
+                if added:
+                    self.stdout.write(f'Added {added} {difficulty} puzzles to pool')
+            depths = getPoolDepths()
+            self.stdout.write('Pool depth: ' + ', '.join(f'{difficulty}={depths[difficulty]}' for difficulty in difficulties))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
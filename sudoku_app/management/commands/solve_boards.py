@@ -0,0 +1,39 @@
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from sudoku_app.solveservice import solveBoards
+
+
+class Command(BaseCommand):
+    help = 'Solves boards (one 81 digit string per line) in parallel, printing each board with its number of solutions (2 meaning many) and its solution if unique'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='file of boards to solve (defaults to stdin)')
+        parser.add_argument('--workers', type=int, help='number of solver processes (defaults to number of CPUs)')
+        parser.add_argument('--batch-size', type=int, default=10000, help='number of boards read and solved at a time')
+
+    def handle(self, *args, **options):
+        f = sys.stdin if options['path'] == '-' else open(options['path'])
+        boards = (line.strip() for line in f if line.strip())
+        total = 0
+        start = time.perf_counter()
+        try:
+            with ProcessPoolExecutor(options['workers']) as executor:
+                while True:
+                    batch = list(islice(boards, options['batch_size']))
+                    if not batch:
+                        break
+                    try:
+                        results = solveBoards(batch, executor)
+                    except ValueError as e:
+                        raise CommandError(e)
+                    for board, result in zip(batch, results):
+                        self.stdout.write(f'{board}\t{result["solutions"]}\t{result["solution"] or ""}')
+                    total += len(batch)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+        elapsed = time.perf_counter() - start
+        self.stderr.write(f'Solved {total} boards in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} boards/s)')
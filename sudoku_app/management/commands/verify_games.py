@@ -0,0 +1,52 @@
+from itertools import islice
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from sudoku_app.boardarray import stackBoards, isValidSolution, agreesWith, isSolved
+from sudoku_app.models import SudokuGame, SudokuRecord
+
+# number of offending game ids listed for each check
+LISTED_IDS = 20
+
+
+class Command(BaseCommand):
+    help = 'Re-verifies the boards of every stored game in vectorized batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='number of games validated at once')
+
+    def handle(self, *args, **options):
+        checks = {
+            'invalid solution': [],
+            'puzzle does not match solution': [],
+            'current board changed given numbers': [],
+            'solved without record': [],
+            'solved_at out of date': [],
+        }
+        total = 0
+        games = SudokuGame.objects.order_by('id').values_list('id', 'initial_board', 'current_board', 'solution_board', 'solved_at', 'custom').iterator(chunk_size=options['chunk_size'])
+        while True:
+            chunk = list(islice(games, options['chunk_size']))
+            if not chunk:
+                break
+            total += len(chunk)
+            ids, initial_boards, current_boards, solution_boards, solved_ats, customs = zip(*chunk)
+            ids = np.array(ids)
+            initials, currents, solutions = stackBoards(initial_boards), stackBoards(current_boards), stackBoards(solution_boards)
+            checks['invalid solution'].extend(ids[~isValidSolution(solutions)].tolist())
+            checks['puzzle does not match solution'].extend(ids[~agreesWith(initials, solutions)].tolist())
+            checks['current board changed given numbers'].extend(ids[~agreesWith(initials, currents)].tolist())
+            solved = isSolved(currents, solutions)
+            checks['solved_at out of date'].extend(ids[solved != np.array([solved_at is not None for solved_at in solved_ats])].tolist())
+            # custom puzzles are not recorded (see recordSolve)
+            solved_ids = ids[solved & ~np.array(customs)].tolist()
+            recorded_ids = set(SudokuRecord.objects.filter(puzzle_id__in=solved_ids).values_list('puzzle_id', flat=True))
+            checks['solved without record'].extend(game_id for game_id in solved_ids if game_id not in recorded_ids)
+        # the same user solving equivalent puzzles (see canonical.py) more than once
+        solved_games = SudokuGame.objects.filter(canonical_hash__isnull=False, id__in=SudokuRecord.objects.values('puzzle_id'))
+        repeats = solved_games.values('user_id', 'canonical_hash').annotate(solves=Count('id')).filter(solves__gt=1).order_by()
+        checks['users with repeated solves of equivalent puzzles'] = sorted({repeat['user_id'] for repeat in repeats})
+        self.stdout.write(f'Verified {total} games')
+        for check, failed_ids in checks.items():
+            listed = ', '.join(map(str, failed_ids[:LISTED_IDS])) + (', ...' if len(failed_ids) > LISTED_IDS else '')
+            self.stdout.write(f'{check}: {len(failed_ids)}' + (f' ({listed})' if failed_ids else ''))
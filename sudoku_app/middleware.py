@@ -0,0 +1,112 @@
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from sudoku_app.routers import read_database, request_writes
+
+logger = logging.getLogger(__name__)
+
+# number of most recent requests per view that percentiles are computed over
+TIMING_SAMPLE_SIZE = 1000
+
+# url names of the views that only read, and can be served from a replica (they may still write, e.g. recording a
+# solve, but writes always go to the default database)
+READ_ONLY_VIEWS = {'puzzles', 'puzzle', 'display_stats', 'display_leaderboard'}
+
+# cookie set on responses to writes, while it is present the user's reads go to the default database
+REPLICA_STICKY_COOKIE = 'read-primary'
+
+# recent (wall time, query count, query time) samples for each url name
+timing_samples = defaultdict(lambda: deque(maxlen=TIMING_SAMPLE_SIZE))
+timing_counts = defaultdict(int)
+timing_lock = threading.Lock()
+
+# database execute wrapper that counts queries and the time spent running them
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+def percentile(sorted_values, fraction):
+    return sorted_values[round(fraction * (len(sorted_values) - 1))]
+
+# p50/p95 of wall time, query count and query time of the recent requests to each view
+def getTimingSummary():
+    with timing_lock:
+        samples = {url_name: list(url_samples) for url_name, url_samples in timing_samples.items()}
+        counts = dict(timing_counts)
+    summary = {}
+    for url_name, url_samples in samples.items():
+        summary[url_name] = {'requests': counts[url_name]}
+        for index, metric in enumerate(('wall_ms', 'queries', 'db_ms')):
+            values = sorted(sample[index] for sample in url_samples)
+            summary[url_name][metric] = {'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95)}
+    return summary
+
+def recordTiming(url_name, wall_ms, queries, db_ms):
+    with timing_lock:
+        timing_samples[url_name].append((wall_ms, queries, db_ms))
+        timing_counts[url_name] += 1
+        count = timing_counts[url_name]
+    # periodically log percentiles so they are visible without the timings endpoint
+    if count % settings.REQUEST_TIMING_LOG_EVERY == 0:
+        url_summary = getTimingSummary()[url_name]
+        logger.info('request timing view=%s requests=%d wall_ms_p50=%.1f wall_ms_p95=%.1f queries_p50=%d queries_p95=%d db_ms_p50=%.1f db_ms_p95=%.1f', url_name, count, url_summary['wall_ms']['p50'], url_summary['wall_ms']['p95'], url_summary['queries']['p50'], url_summary['queries']['p95'], url_summary['db_ms']['p50'], url_summary['db_ms']['p95'])
+
+# records wall time, number of queries and query time of every request that resolved to a named url,
+# and reports them to the browser in a Server-Timing header
+# (sync only, under ASGI django runs it in the same thread as the view's database work)
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_timer))
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - start) * 1000
+        db_ms = query_timer.duration * 1000
+        if request.resolver_match is not None and request.resolver_match.url_name:
+            recordTiming(request.resolver_match.url_name, wall_ms, query_timer.count, db_ms)
+        response['Server-Timing'] = f'app;dur={wall_ms:.1f}, db;dur={db_ms:.1f};desc="{query_timer.count} queries"'
+        return response
+
+# picks a random replica for GET requests to read-only views, unless the user wrote within the last
+# REPLICA_STICKY_SECONDS (replicas may not have their changes yet), whatever the method of the request that wrote
+# (e.g. puzzles are created with GET requests)
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = {'wrote': False}
+        read_token, writes_token = read_database.set(None), request_writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(read_token)
+            request_writes.reset(writes_token)
+        if settings.DATABASE_REPLICAS and writes['wrote']:
+            response.set_cookie(REPLICA_STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+    # the view is only known once the url is resolved
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (settings.DATABASE_REPLICAS and request.method in ('GET', 'HEAD') and REPLICA_STICKY_COOKIE not in request.COOKIES
+                and request.resolver_match.url_name in READ_ONLY_VIEWS):
+            read_database.set(random.choice(settings.DATABASE_REPLICAS))
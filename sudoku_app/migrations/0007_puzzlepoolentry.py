@@ -0,0 +1,22 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sudoku_app', '0006_auto_20210414_1052'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PuzzlePoolEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('initial_board', models.CharField(max_length=500)),
+                ('solution_board', models.CharField(max_length=500)),
+                ('difficulty', models.CharField(choices=[('easy', 'easy'), ('medium', 'medium'), ('hard', 'hard')], db_index=True, max_length=10)),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:31
+
+import json
+
+from django.db import migrations
+
+
+# convert json of nested lists into string of 81 digits
+def json_to_compact(board):
+    return ''.join(str(val) for row in json.loads(board) for val in row)
+
+# convert string of 81 digits into json of nested lists
+def compact_to_json(board):
+    return json.dumps([[int(val) for val in board[i:i + 9]] for i in range(0, 81, 9)])
+
+def convert_boards(apps, convert):
+    SudokuGame = apps.get_model('sudoku_app', 'SudokuGame')
+    PuzzlePoolEntry = apps.get_model('sudoku_app', 'PuzzlePoolEntry')
+    for game in SudokuGame.objects.all().iterator():
+        game.initial_board = convert(game.initial_board)
+        game.current_board = convert(game.current_board)
+        game.solution_board = convert(game.solution_board)
+        game.save(update_fields=['initial_board', 'current_board', 'solution_board'])
+    for entry in PuzzlePoolEntry.objects.all().iterator():
+        entry.initial_board = convert(entry.initial_board)
+        entry.solution_board = convert(entry.solution_board)
+        entry.save(update_fields=['initial_board', 'solution_board'])
+
+def forwards(apps, schema_editor):
+    convert_boards(apps, json_to_compact)
+
+def backwards(apps, schema_editor):
+    convert_boards(apps, compact_to_json)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sudoku_app', '0007_puzzlepoolentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
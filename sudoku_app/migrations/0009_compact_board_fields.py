@@ -0,0 +1,38 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sudoku_app', '0008_compact_boards'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='puzzlepoolentry',
+            name='initial_board',
+            field=models.CharField(max_length=81),
+        ),
+        migrations.AlterField(
+            model_name='puzzlepoolentry',
+            name='solution_board',
+            field=models.CharField(max_length=81),
+        ),
+        migrations.AlterField(
+            model_name='sudokugame',
+            name='current_board',
+            field=models.CharField(max_length=81),
+        ),
+        migrations.AlterField(
+            model_name='sudokugame',
+            name='initial_board',
+            field=models.CharField(max_length=81),
+        ),
+        migrations.AlterField(
+            model_name='sudokugame',
+            name='solution_board',
+            field=models.CharField(max_length=81),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:33
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+# fill solve counts from records that existed before the counts were tracked
+def populate_solve_counts(apps, schema_editor):
+    SudokuRecord = apps.get_model('sudoku_app', 'SudokuRecord')
+    UserSolveCount = apps.get_model('sudoku_app', 'UserSolveCount')
+    solve_counts = {}
+    for user_id, difficulty, total in SudokuRecord.objects.values_list('user_id', 'difficulty').annotate(total=Count('puzzle_id')).order_by():
+        solve_count = solve_counts.setdefault(user_id, UserSolveCount(user_id=user_id))
+        solve_count.total_solved += total
+        if difficulty in ('easy', 'medium', 'hard'):
+            setattr(solve_count, f'{difficulty}_solved', total)
+    UserSolveCount.objects.bulk_create(solve_counts.values(), batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sudoku_app', '0009_compact_board_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSolveCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('easy_solved', models.IntegerField(default=0)),
+                ('medium_solved', models.IntegerField(default=0)),
+                ('hard_solved', models.IntegerField(default=0)),
+                ('total_solved', models.IntegerField(db_index=True, default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(populate_solve_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sudoku_app', '0010_usersolvecount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sudokugame',
+            index=models.Index(fields=['user', 'id'], name='sudoku_app__user_id_740f54_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sudokurecord',
+            index=models.Index(fields=['user', 'difficulty'], name='sudoku_app__user_id_e4bf9b_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sudoku_app', '0011_game_record_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sudokugame',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
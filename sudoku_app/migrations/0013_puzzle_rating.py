@@ -0,0 +1,33 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sudoku_app', '0012_sudokugame_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='puzzlepoolentry',
+            name='rating',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puzzlepoolentry',
+            name='rating_technique',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='sudokugame',
+            name='rating',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sudokugame',
+            name='rating_technique',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sudoku_app', '0013_puzzle_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='puzzlepoolentry',
+            name='canonical_hash',
+            field=models.CharField(blank=True, max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='sudokugame',
+            name='canonical_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=40, null=True),
+        ),
+    ]
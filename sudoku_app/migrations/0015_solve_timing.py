@@ -0,0 +1,64 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sudoku_app', '0014_canonical_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoveEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_id', models.IntegerField()),
+                ('position', models.PositiveSmallIntegerField()),
+                ('value', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        # added without a default first, so existing rows are left unknown instead of getting the migration time
+        migrations.AddField(
+            model_name='sudokugame',
+            name='created_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='sudokugame',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, null=True),
+        ),
+        migrations.AddField(
+            model_name='sudokugame',
+            name='first_move_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sudokurecord',
+            name='solve_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        # added without a default first, so existing rows are left unknown instead of getting the migration time
+        migrations.AddField(
+            model_name='sudokurecord',
+            name='solved_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='sudokurecord',
+            name='solved_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='sudokurecord',
+            index=models.Index(fields=['difficulty', 'solve_seconds'], name='sudoku_app__difficu_4a7885_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moveevent',
+            index=models.Index(fields=['game_id', 'id'], name='sudoku_app__game_id_804b8f_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:50
+
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Length, Replace
+
+
+# fill progress of games saved before it was tracked, in the database (filled cells are the non-zero characters)
+def populate_progress(apps, schema_editor):
+    SudokuGame = apps.get_model('sudoku_app', 'SudokuGame')
+    SudokuGame.objects.update(filled_count=Length(Replace(F('current_board'), Value('0'), Value(''))))
+    SudokuGame.objects.filter(current_board=F('solution_board')).update(solved=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sudoku_app', '0015_solve_timing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sudokugame',
+            name='filled_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sudokugame',
+            name='solved',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(populate_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:51
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
+
+
+# solved games take the time their solve was recorded, or the migration time if that is unknown
+def populate_solved_at(apps, schema_editor):
+    SudokuGame = apps.get_model('sudoku_app', 'SudokuGame')
+    SudokuRecord = apps.get_model('sudoku_app', 'SudokuRecord')
+    recorded_at = SudokuRecord.objects.filter(puzzle_id=OuterRef('pk')).values('solved_at')[:1]
+    SudokuGame.objects.filter(solved=True).update(solved_at=Coalesce(Subquery(recorded_at), Now()))
+
+def populate_solved(apps, schema_editor):
+    SudokuGame = apps.get_model('sudoku_app', 'SudokuGame')
+    SudokuGame.objects.filter(solved_at__isnull=False).update(solved=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sudoku_app', '0016_game_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sudokugame',
+            name='solved_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(populate_solved_at, populate_solved),
+        migrations.RemoveField(
+            model_name='sudokugame',
+            name='solved',
+        ),
+    ]
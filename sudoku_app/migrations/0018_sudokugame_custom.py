@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sudoku_app', '0017_game_solved_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sudokugame',
+            name='custom',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 # Create your models here.
@@ -9,17 +10,37 @@ class SudokuGame(models.Model):
         ('medium', 'medium'),
         ('hard', 'hard')
     ]
-    initial_board = models.CharField(max_length=500)
-    current_board = models.CharField(max_length=500)
-    solution_board = models.CharField(max_length=500)
+    initial_board = models.CharField(max_length=81)
+    current_board = models.CharField(max_length=81)
+    solution_board = models.CharField(max_length=81)
     difficulty = models.CharField(max_length=10, choices=DIFFICULTIES)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # incremented every time current_board changes
+    version = models.PositiveIntegerField(default=0)
+    # difficulty according to the logical solver (see rating.py), None until rated
+    rating = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    rating_technique = models.CharField(max_length=20, null=True, blank=True)
+    # hash of the initial board's canonical form (see canonical.py), shared by every game of an equivalent puzzle
+    canonical_hash = models.CharField(max_length=40, null=True, blank=True, db_index=True)
+    # unknown for games created before these were tracked
+    created_at = models.DateTimeField(default=timezone.now, null=True)
+    first_move_at = models.DateTimeField(null=True, blank=True)
+    # progress of current_board, kept up to date whenever it is saved so puzzles can be listed without loading boards
+    filled_count = models.PositiveSmallIntegerField(default=0)
+    # set when current_board first matches solution_board, so solved games can be found without comparing boards
+    solved_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # submitted by the player instead of generated, and not counted on the leaderboard
+    custom = models.BooleanField(default=False)
+
+    class Meta:
+        # puzzles are always looked up by owner, either listed or by id
+        indexes = [models.Index(fields=['user', 'id'])]
 
     def __str__(self):
         return str(self.id)
     
     def is_solved(self):
-        return self.current_board == self.solution_board
+        return self.solved_at is not None
 
 class SudokuRecord(models.Model):
     DIFFICULTIES = [
@@ -30,9 +51,46 @@ class SudokuRecord(models.Model):
     puzzle_id = models.IntegerField(primary_key=True)
     difficulty = models.CharField(max_length=10, choices=DIFFICULTIES)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # unknown for puzzles solved before these were tracked
+    solved_at = models.DateTimeField(default=timezone.now, null=True)
+    # seconds from the game being created to it being solved
+    solve_seconds = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        # records are counted per user and difficulty, and solve times are ranked per difficulty
+        indexes = [models.Index(fields=['user', 'difficulty']), models.Index(fields=['difficulty', 'solve_seconds'])]
 
-    
+# puzzles generated ahead of time so that creating a game does not have to wait on the generator
+class PuzzlePoolEntry(models.Model):
+    DIFFICULTIES = [
+        ('easy', 'easy'),
+        ('medium', 'medium'),
+        ('hard', 'hard')
+    ]
+    initial_board = models.CharField(max_length=81)
+    solution_board = models.CharField(max_length=81)
+    difficulty = models.CharField(max_length=10, choices=DIFFICULTIES, db_index=True)
+    rating = models.PositiveIntegerField(null=True, blank=True)
+    rating_technique = models.CharField(max_length=20, null=True, blank=True)
+    canonical_hash = models.CharField(max_length=40, null=True, blank=True)
 
+# number of puzzles each user has solved, updated whenever a SudokuRecord is created
+# so that statistics and the leaderboard do not have to aggregate every record
+class UserSolveCount(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    easy_solved = models.IntegerField(default=0)
+    medium_solved = models.IntegerField(default=0)
+    hard_solved = models.IntegerField(default=0)
+    total_solved = models.IntegerField(default=0, db_index=True)
 
+# append-only log of every cell change made to a game, for replays and timing (see events.py)
+# game_id is not a foreign key so events can be inserted in bulk without locking the game row, and outlive deleted games
+class MoveEvent(models.Model):
+    game_id = models.IntegerField()
+    position = models.PositiveSmallIntegerField()
+    value = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        # events are replayed per game in the order they were made
+        indexes = [models.Index(fields=['game_id', 'id'])]
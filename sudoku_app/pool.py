@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from sudoku_app.models import PuzzlePoolEntry, SudokuGame
+from sudoku_app.helper import generateSudoku
+from sudoku_app.boards import countFilled
+
+logger = logging.getLogger(__name__)
+
+# number of times a claim is retried when another worker deletes the chosen entry first
+CLAIM_ATTEMPTS = 3
+
+# number of puzzles handed to a worker process at a time when generating many puzzles
+GENERATION_CHUNKSIZE = 16
+
+# process pool used to generate puzzles from web requests, created on first use
+generation_executor = None
+
+# semaphores bounding generation for async claims, one per event loop as an asyncio.Semaphore only works on one loop
+# (under ASGI every request shares one loop, under WSGI each async request runs in a loop of its own)
+generation_semaphores = weakref.WeakKeyDictionary()
+
+def getGenerationExecutor():
+    global generation_executor
+    if generation_executor is None:
+        generation_executor = ProcessPoolExecutor(settings.ASYNC_GENERATION_WORKERS)
+    return generation_executor
+
+def getGenerationSemaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = generation_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = generation_semaphores[loop] = asyncio.Semaphore(settings.ASYNC_GENERATION_CONCURRENCY)
+    return semaphore
+
+# retrieve number of ready puzzles for each difficulty
+def getPoolDepths():
+    depths = dict(PuzzlePoolEntry.objects.values_list('difficulty').annotate(total=Count('id')).order_by())
+    return {difficulty: depths.get(difficulty, 0) for difficulty, _ in PuzzlePoolEntry.DIFFICULTIES}
+
+# pool entry holding generated puzzle data (see generateSudoku)
+def makePoolEntry(puzzle_data, difficulty):
+    return PuzzlePoolEntry(initial_board=puzzle_data['puzzle'], solution_board=puzzle_data['solution'], difficulty=difficulty, rating=puzzle_data['rating'], rating_technique=puzzle_data['technique'], canonical_hash=puzzle_data['hash'])
+
+# unsaved game of puzzle data (see generateSudoku) for user, extra holds any other fields (e.g. custom=True)
+def gameFromPuzzleData(puzzle_data, user, difficulty, **extra):
+    return SudokuGame(initial_board=puzzle_data['puzzle'], current_board=puzzle_data['puzzle'], solution_board=puzzle_data['solution'], filled_count=countFilled(puzzle_data['puzzle']), difficulty=difficulty, rating=puzzle_data['rating'], rating_technique=puzzle_data['technique'], canonical_hash=puzzle_data['hash'], user=user, **extra)
+
+# generate a puzzle and solution ready to be stored in the pool (see generateSudoku for hashed)
+def createPoolEntry(difficulty, hashed=False):
+    return makePoolEntry(generateSudoku(difficulty, hashed), difficulty)
+
+# take a ready puzzle out of the pool, returns None if the pool is empty
+def takePoolEntry(difficulty):
+    for _ in range(CLAIM_ATTEMPTS):
+        with transaction.atomic():
+            # skip rows locked by other workers, and only count the claim if this worker deleted the row
+            candidate = PuzzlePoolEntry.objects.select_for_update(skip_locked=True).filter(difficulty=difficulty).order_by('id').first()
+            if candidate is None:
+                return None
+            deleted, _ = PuzzlePoolEntry.objects.filter(pk=candidate.pk).delete()
+            if deleted:
+                return candidate
+    return None
+
+def logClaim(difficulty, source, start):
+    logger.info('puzzle pool claim difficulty=%s source=%s latency_ms=%.2f', difficulty, source, (time.perf_counter() - start) * 1000)
+
+# take a ready puzzle out of the pool, falling back to generating one if the pool is empty
+def claimPuzzle(difficulty):
+    start = time.perf_counter()
+    entry = takePoolEntry(difficulty)
+    source = 'pool'
+    if entry is None:
+        source = 'generated'
+        entry = createPoolEntry(difficulty)
+    logClaim(difficulty, source, start)
+    return {'puzzle': entry.initial_board, 'solution': entry.solution_board, 'rating': entry.rating, 'technique': entry.rating_technique, 'hash': entry.canonical_hash}
+
+# async variant of claimPuzzle that keeps the event loop free, the pool is queried in a thread and any
+# fallback generation runs in a process pool, with at most ASYNC_GENERATION_CONCURRENCY generations at once
+# raises asyncio.TimeoutError if generation takes longer than ASYNC_GENERATION_TIMEOUT seconds
+async def claimPuzzleAsync(difficulty):
+    start = time.perf_counter()
+    entry = await sync_to_async(takePoolEntry)(difficulty)
+    source = 'pool'
+    if entry is None:
+        source = 'generated'
+        async with getGenerationSemaphore():
+            generation = asyncio.get_running_loop().run_in_executor(getGenerationExecutor(), generateSudoku, difficulty)
+            entry = makePoolEntry(await asyncio.wait_for(generation, settings.ASYNC_GENERATION_TIMEOUT), difficulty)
+    logClaim(difficulty, source, start)
+    return {'puzzle': entry.initial_board, 'solution': entry.solution_board, 'rating': entry.rating, 'technique': entry.rating_technique, 'hash': entry.canonical_hash}
+
+# top up the pool for a difficulty to the watermark, returns number of puzzles added
+# (refills run in the background, so the entries are hashed straight away)
+def refillPool(difficulty, watermark):
+    missing = watermark - PuzzlePoolEntry.objects.filter(difficulty=difficulty).count()
+    if missing <= 0:
+        return 0
+    PuzzlePoolEntry.objects.bulk_create([createPoolEntry(difficulty, hashed=True) for _ in range(missing)])
+    return missing
+
+# generate (and rate) puzzles of given difficulty across the processes of executor, yielding puzzle data (see generateSudoku)
+def generatePuzzles(executor, difficulty, count):
+    return executor.map(generateSudoku, repeat(difficulty, count), chunksize=GENERATION_CHUNKSIZE)
+
+# create count new puzzles of given difficulty for each user, inserting games chunk_size at a time
+# returns number of games created
+def bulkCreatePuzzles(executor, users, difficulty, count, chunk_size=500):
+    boards = generatePuzzles(executor, difficulty, len(users) * count)
+    games = []
+    created = 0
+    for user in users:
+        for _ in range(count):
+            games.append(gameFromPuzzleData(next(boards), user, difficulty))
+            if len(games) >= chunk_size:
+                created += len(SudokuGame.objects.bulk_create(games))
+                games = []
+    if games:
+        created += len(SudokuGame.objects.bulk_create(games))
+    return created
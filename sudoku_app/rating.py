@@ -0,0 +1,191 @@
+from itertools import combinations
+from sudoku_app.solver import ALL_DIGITS, BIT_COUNT, BIT_DIGIT, solveBoard
+from sudoku_app.hints import UNITS_OF, UNIT_CELLS, PEERS
+
+# techniques of the logical solver from easiest to hardest, with the score added each time one is applied
+# (a guess is made when none of them apply, placing the solution digit in the blank with fewest candidates)
+TECHNIQUES = (
+    ('naked single', 1),
+    ('hidden single', 2),
+    ('locked candidates', 4),
+    ('naked pair', 6),
+    ('hidden pair', 8),
+    ('naked triple', 10),
+    ('hidden triple', 12),
+    ('x-wing', 16),
+    ('swordfish', 20),
+    ('guess', 50),
+)
+TECHNIQUE_LEVELS = {name: level for level, (name, _) in enumerate(TECHNIQUES)}
+
+# difficulty of puzzles whose hardest technique is at most the given one, for puzzles not made by the generator
+TECHNIQUE_DIFFICULTIES = (('hidden single', 'easy'), ('hidden triple', 'medium'), ('guess', 'hard'))
+
+# rows and columns of the board as unit numbers (see hints.py)
+ROW_UNITS = tuple(range(9))
+COL_UNITS = tuple(range(9, 18))
+
+# board state of the logical solver, candidates are bitmasks as in solver.py
+class LogicalSolver:
+    def __init__(self, board):
+        self.cells = list(board)
+        self.candidates = [0] * 81
+        self.blanks = 0
+        for pos, val in enumerate(self.cells):
+            if val == 0:
+                self.blanks += 1
+                used = 0
+                for peer in PEERS[pos]:
+                    used |= 1 << self.cells[peer]
+                self.candidates[pos] = ALL_DIGITS & ~used
+
+    def place(self, pos, value):
+        bit = 1 << value
+        self.cells[pos] = value
+        self.candidates[pos] = 0
+        self.blanks -= 1
+        for peer in PEERS[pos]:
+            self.candidates[peer] &= ~bit
+
+    # remove bits from the candidates of positions, returns True if anything was removed
+    def eliminate(self, positions, bits):
+        progress = False
+        for pos in positions:
+            if self.candidates[pos] & bits:
+                self.candidates[pos] &= ~bits
+                progress = True
+        return progress
+
+    # positions in unit that have bit as a candidate
+    def placesFor(self, unit, bit):
+        return [pos for pos in UNIT_CELLS[unit] if self.candidates[pos] & bit]
+
+    def nakedSingle(self):
+        for pos in range(81):
+            if BIT_COUNT[self.candidates[pos]] == 1:
+                self.place(pos, BIT_DIGIT[self.candidates[pos]])
+                return True
+        return False
+
+    def hiddenSingle(self):
+        for unit in range(27):
+            for digit in range(1, 10):
+                places = self.placesFor(unit, 1 << digit)
+                if len(places) == 1:
+                    self.place(places[0], digit)
+                    return True
+        return False
+
+    # pointing (a digit confined to one line within a box) and box/line reduction (a digit confined to one box within a line)
+    def lockedCandidates(self):
+        for unit in range(27):
+            for digit in range(1, 10):
+                bit = 1 << digit
+                places = self.placesFor(unit, bit)
+                if len(places) < 2:
+                    continue
+                kind = unit // 9
+                for index in range(3):
+                    other_unit = UNITS_OF[places[0]][index]
+                    if index == kind or any(UNITS_OF[pos][index] != other_unit for pos in places[1:]):
+                        continue
+                    if self.eliminate([pos for pos in UNIT_CELLS[other_unit] if pos not in places], bit):
+                        return True
+        return False
+
+    # size cells of a unit whose candidates together are only size digits
+    def nakedSubset(self, size):
+        for unit in range(27):
+            blanks = [pos for pos in UNIT_CELLS[unit] if 2 <= BIT_COUNT[self.candidates[pos]] <= size]
+            for subset in combinations(blanks, size):
+                bits = 0
+                for pos in subset:
+                    bits |= self.candidates[pos]
+                if BIT_COUNT[bits] == size and self.eliminate([pos for pos in UNIT_CELLS[unit] if pos not in subset], bits):
+                    return True
+        return False
+
+    # size digits of a unit that together only fit in size cells
+    def hiddenSubset(self, size):
+        for unit in range(27):
+            digit_places = {}
+            for digit in range(1, 10):
+                places = self.placesFor(unit, 1 << digit)
+                if 2 <= len(places) <= size:
+                    digit_places[digit] = places
+            for digits in combinations(digit_places, size):
+                cells = set()
+                for digit in digits:
+                    cells.update(digit_places[digit])
+                if len(cells) == size:
+                    keep = 0
+                    for digit in digits:
+                        keep |= 1 << digit
+                    if self.eliminate(cells, ALL_DIGITS & ~keep):
+                        return True
+        return False
+
+    # size lines in which a digit only fits in the same size crossing lines (x-wing for 2, swordfish for 3)
+    def fish(self, size):
+        for base_units, cover_index in ((ROW_UNITS, 1), (COL_UNITS, 0)):
+            for digit in range(1, 10):
+                bit = 1 << digit
+                lines = {}
+                for unit in base_units:
+                    covers = {UNITS_OF[pos][cover_index] for pos in self.placesFor(unit, bit)}
+                    if 2 <= len(covers) <= size:
+                        lines[unit] = covers
+                for subset in combinations(lines, size):
+                    covers = set()
+                    for unit in subset:
+                        covers |= lines[unit]
+                    if len(covers) == size:
+                        others = [pos for cover in covers for pos in UNIT_CELLS[cover] if UNITS_OF[pos][1 - cover_index] not in subset]
+                        if self.eliminate(others, bit):
+                            return True
+        return False
+
+    # place the solution digit in the blank with fewest candidates
+    def guess(self, solution):
+        pos = min((pos for pos in range(81) if self.cells[pos] == 0), key=lambda pos: BIT_COUNT[self.candidates[pos]])
+        self.place(pos, solution[pos])
+        return True
+
+    # apply the easiest technique that makes progress, returns its name
+    def step(self, solution):
+        steps = (
+            ('naked single', self.nakedSingle),
+            ('hidden single', self.hiddenSingle),
+            ('locked candidates', self.lockedCandidates),
+            ('naked pair', lambda: self.nakedSubset(2)),
+            ('hidden pair', lambda: self.hiddenSubset(2)),
+            ('naked triple', lambda: self.nakedSubset(3)),
+            ('hidden triple', lambda: self.hiddenSubset(3)),
+            ('x-wing', lambda: self.fish(2)),
+            ('swordfish', lambda: self.fish(3)),
+            ('guess', lambda: self.guess(solution)),
+        )
+        for name, technique in steps:
+            if technique():
+                return name
+
+# difficulty (easy, medium or hard) of a puzzle whose hardest technique is technique
+def techniqueDifficulty(technique):
+    return next(difficulty for hardest, difficulty in TECHNIQUE_DIFFICULTIES if TECHNIQUE_LEVELS[technique] <= TECHNIQUE_LEVELS[hardest])
+
+# grade a puzzle by solving it the way a person would, returns (score, hardest technique, number of steps)
+# the score adds up the score of every technique applied, so long chains of easy steps also count
+# returns None if the puzzle has no solution
+def ratePuzzle(board, solution=None):
+    solution = solution or solveBoard(board)
+    if solution is None:
+        return None
+    solver = LogicalSolver(board)
+    score, hardest, steps = 0, 0, 0
+    while solver.blanks:
+        name = solver.step(solution)
+        level = TECHNIQUE_LEVELS[name]
+        score += TECHNIQUES[level][1]
+        hardest = max(hardest, level)
+        steps += 1
+    return score, TECHNIQUES[hardest][0], steps
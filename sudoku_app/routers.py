@@ -0,0 +1,30 @@
+import contextvars
+
+# database alias that reads of the current request go to, None for the default database
+read_database = contextvars.ContextVar('read_database', default=None)
+
+# writes made by the current request, as {'wrote': True} once it has written (a dict shared with copies of the context,
+# so writes made in sync_to_async threads or async views are seen too), None outside of requests
+request_writes = contextvars.ContextVar('request_writes', default=None)
+
+# sends reads to the replica chosen for the current request by ReplicaRoutingMiddleware (see middleware.py), and
+# everything else to the default database (including the database cache table, whose invalidations must be seen
+# straight away)
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'django_cache':
+            return 'default'
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        writes = request_writes.get()
+        if writes is not None:
+            writes['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    # replicas copy the default database's schema
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
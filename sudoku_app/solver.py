@@ -0,0 +1,100 @@
+import random
+
+# boards are flat lists of 81 ints in row-major order, 0 represents a blank
+# candidates are tracked as bitmasks where bit d is set if digit d (1-9) is used/allowed
+ALL_DIGITS = 0x3FE
+ROW_OF = tuple(i // 9 for i in range(81))
+COL_OF = tuple(i % 9 for i in range(81))
+BOX_OF = tuple((i // 27) * 3 + (i % 9) // 3 for i in range(81))
+BIT_COUNT = tuple(bin(mask).count('1') for mask in range(1024))
+BIT_DIGIT = {1 << d: d for d in range(1, 10)}
+
+# raised when a search visits more nodes than it was allowed to
+class SearchLimitExceeded(Exception):
+    pass
+
+# build row/column/box masks for a board, returns None if a digit appears twice in a unit
+def _prepare(board):
+    rows, cols, boxes = [0] * 9, [0] * 9, [0] * 9
+    empties = []
+    for pos, val in enumerate(board):
+        if val == 0:
+            empties.append(pos)
+            continue
+        bit = 1 << val
+        r, c, b = ROW_OF[pos], COL_OF[pos], BOX_OF[pos]
+        if (rows[r] | cols[c] | boxes[b]) & bit:
+            return None
+        rows[r] |= bit
+        cols[c] |= bit
+        boxes[b] |= bit
+    return rows, cols, boxes, empties
+
+# depth first search that always branches on the blank with the fewest candidates
+# appends complete boards to solutions and returns True once limit solutions have been found
+# budget is None or a one item list holding the number of nodes the search may still visit
+def _search(cells, rows, cols, boxes, empties, limit, solutions, rng, budget=None):
+    if budget is not None:
+        budget[0] -= 1
+        if budget[0] < 0:
+            raise SearchLimitExceeded()
+    if not empties:
+        solutions.append(list(cells))
+        return len(solutions) >= limit
+    best_k, best_mask, best_count = 0, 0, 10
+    for k, pos in enumerate(empties):
+        mask = ALL_DIGITS & ~(rows[ROW_OF[pos]] | cols[COL_OF[pos]] | boxes[BOX_OF[pos]])
+        count = BIT_COUNT[mask]
+        if count < best_count:
+            best_k, best_mask, best_count = k, mask, count
+            if count <= 1:
+                break
+    if best_count == 0:
+        return False
+    pos = empties[best_k]
+    empties[best_k] = empties[-1]
+    empties.pop()
+    r, c, b = ROW_OF[pos], COL_OF[pos], BOX_OF[pos]
+    bits = []
+    while best_mask:
+        bit = best_mask & -best_mask
+        best_mask ^= bit
+        bits.append(bit)
+    if rng is not None:
+        rng.shuffle(bits)
+    done = False
+    for bit in bits:
+        rows[r] |= bit
+        cols[c] |= bit
+        boxes[b] |= bit
+        cells[pos] = BIT_DIGIT[bit]
+        done = _search(cells, rows, cols, boxes, empties, limit, solutions, rng, budget)
+        rows[r] ^= bit
+        cols[c] ^= bit
+        boxes[b] ^= bit
+        if done:
+            break
+    cells[pos] = 0
+    empties.append(pos)
+    empties[best_k], empties[-1] = empties[-1], empties[best_k]
+    return done
+
+# find up to limit solutions of board (rng randomizes the order digits are tried in)
+# raises SearchLimitExceeded if that takes more than max_nodes search nodes
+def findSolutions(board, limit=1, rng=None, max_nodes=None):
+    prepared = _prepare(board)
+    if prepared is None:
+        return []
+    rows, cols, boxes, empties = prepared
+    solutions = []
+    _search(list(board), rows, cols, boxes, empties, limit, solutions, rng, [max_nodes] if max_nodes is not None else None)
+    return solutions
+
+# returns the solved board, or None if the board has no solution
+def solveBoard(board):
+    solutions = findSolutions(board, 1)
+    return solutions[0] if solutions else None
+
+# create a random, completely filled board
+def randomSolution(rng=None):
+    return findSolutions([0] * 81, 1, rng or random.Random())[0]
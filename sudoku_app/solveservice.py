@@ -0,0 +1,60 @@
+import os
+import threading
+from collections import OrderedDict
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from sudoku_app.boards import decodeBoard, encodeBoard, isBoardString
+from sudoku_app.solver import findSolutions, SearchLimitExceeded
+
+# most boards handed to a solver process at a time when solving many boards (fewer for small batches,
+# so that every process gets a share)
+SOLVE_CHUNKSIZE = 64
+
+# process pool solving boards for web requests and commands, created on first use
+solver_executor = None
+
+def getSolverExecutor():
+    global solver_executor
+    if solver_executor is None:
+        solver_executor = ProcessPoolExecutor(settings.SOLVER_WORKERS)
+    return solver_executor
+
+# results of recently solved boards, keyed by board string
+solve_cache = OrderedDict()
+solve_cache_lock = threading.Lock()
+
+# solve board string, returns (number of solutions, 0, 1 or 2 for two or more, and the solution as a board string
+# if there is exactly one), the number of solutions is None if that could not be decided within max_nodes search nodes
+# (runs in the solver processes)
+def analyzeBoard(board_string, max_nodes=None):
+    try:
+        solutions = findSolutions(decodeBoard(board_string), 2, max_nodes=max_nodes)
+    except SearchLimitExceeded:
+        return None, None
+    return len(solutions), encodeBoard(solutions[0]) if len(solutions) == 1 else None
+
+# solve board strings in the solver processes (or executor, if given), skipping boards that were solved recently
+# returns {'solutions': 0, 1 or 2 (meaning many), 'solution': board string or None} for each board, in order
+# (with max_nodes, boards that take longer to solve are given up on and reported with 'solutions' None, uncached)
+# raises ValueError if a board is not a board string
+def solveBoards(board_strings, executor=None, max_nodes=None):
+    if not all(isBoardString(board_string) for board_string in board_strings):
+        raise ValueError('Boards must be strings of 81 digits')
+    with solve_cache_lock:
+        results = {board_string: solve_cache[board_string] for board_string in board_strings if board_string in solve_cache}
+    unsolved = list(dict.fromkeys(board_string for board_string in board_strings if board_string not in results))
+    if unsolved:
+        chunksize = max(1, min(SOLVE_CHUNKSIZE, len(unsolved) // (4 * os.cpu_count())))
+        results.update(zip(unsolved, (executor or getSolverExecutor()).map(analyzeBoard, unsolved, repeat(max_nodes), chunksize=chunksize)))
+    with solve_cache_lock:
+        for board_string in board_strings:
+            if results[board_string][0] is not None:
+                solve_cache[board_string] = results[board_string]
+                solve_cache.move_to_end(board_string)
+        while len(solve_cache) > settings.SOLVE_CACHE_SIZE:
+            solve_cache.popitem(last=False)
+    return [{'solutions': results[board_string][0], 'solution': results[board_string][1]} for board_string in board_strings]
+
+def solveBoard(board_string, executor=None, max_nodes=None):
+    return solveBoards([board_string], executor, max_nodes)[0]
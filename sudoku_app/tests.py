@@ -1,3 +1,586 @@
-from django.test import TestCase
+import asyncio
+import io
+import os
+import random
+import sqlite3
+import tempfile
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from sudoku_app.boards import decodeBoard, encodeBoard, countFilled
+from sudoku_app.boardform import parseBoardForm
+from sudoku_app.boardarray import stackBoards, findConflicts, isValidSolution, agreesWith
+from sudoku_app.canonical import canonicalHash
+from sudoku_app.events import move_event_buffer, flushMoveEvents
+from sudoku_app.transfer import exportLines, importLines
+from sudoku_app.solveservice import solve_cache, solveBoards, solveBoard
+from sudoku_app.middleware import timing_samples, timing_counts, recordTiming, getTimingSummary
+from sudoku_app.generator import generatePuzzle
+from sudoku_app.solver import findSolutions
+from sudoku_app.models import SudokuGame, SudokuRecord, UserSolveCount, PuzzlePoolEntry, MoveEvent
+from sudoku_app.pool import takePoolEntry, claimPuzzle, refillPool, getGenerationSemaphore
+from sudoku_app.helper import recordSolve, rebuildSolveCounts, getLeaderboard, getUserRank, invalidateLeaderboard
+from sudoku_app.rating import ratePuzzle
 
-# Create your tests here.
+# move events are flushed by the tests themselves rather than a background thread
+no_event_flusher = override_settings(MOVE_EVENT_FLUSH_INTERVAL=0)
+
+# create a game with a fixed puzzle for given user
+def createGame(user, difficulty='easy'):
+    puzzle, solution = generatePuzzle(difficulty, random.Random(0))
+    initial_board, solution_board = encodeBoard(puzzle), encodeBoard(solution)
+    return SudokuGame.objects.create(initial_board=initial_board, current_board=initial_board, solution_board=solution_board, filled_count=countFilled(initial_board), difficulty=difficulty, user=user)
+
+# tests of a logged in player with one game
+@no_event_flusher
+class GameTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('player', 'player@example.com', 'password')
+        self.game = createGame(self.user)
+        self.client.force_login(self.user)
+
+class PuzzleViewQueryTests(GameTestCase):
+    # two of each request's queries load the session and the logged in user
+    def test_puzzle_queries(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/puzzles/{self.game.id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_save_puzzle_queries(self):
+        with self.assertNumQueries(4):
+            self.client.post(f'/puzzles/{self.game.id}/save', {'(0,0)': '1'})
+
+    def test_check_puzzle_queries(self):
+        with self.assertNumQueries(4):
+            response = self.client.post(f'/puzzles/{self.game.id}/check', {'(0,0)': '1'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_add_hint_queries(self):
+        with self.assertNumQueries(4):
+            self.client.post(f'/puzzles/{self.game.id}/hint', {})
+
+    def test_reset_puzzle_queries(self):
+        blank = self.game.initial_board.index('0')
+        self.game.current_board = self.game.initial_board[:blank] + '1' + self.game.initial_board[blank + 1:]
+        self.game.save()
+        with self.assertNumQueries(4):
+            self.client.post(f'/puzzles/{self.game.id}/reset')
+
+    def test_puzzles_queries(self):
+        with self.assertNumQueries(3):
+            self.client.get('/puzzles/')
+
+    @override_settings(PUZZLE_LIST_PAGE_SIZE=1)
+    def test_puzzles_are_paginated_by_id(self):
+        second_game = createGame(self.user)
+        response = self.client.get('/puzzles/')
+        self.assertEqual([puzzle.id for puzzle in response.context['puzzles']], [self.game.id])
+        self.assertContains(response, f'?after={self.game.id}')
+        response = self.client.get(f'/puzzles/?after={self.game.id}')
+        self.assertEqual([puzzle.id for puzzle in response.context['puzzles']], [second_game.id])
+        self.assertIsNone(response.context['next_after'])
+
+    def test_other_users_puzzle_is_not_loaded(self):
+        other_user = User.objects.create_user('other', 'other@example.com', 'password')
+        other_game = createGame(other_user)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/puzzles/{other_game.id}/')
+        self.assertRedirects(response, '/puzzles', fetch_redirect_response=False)
+
+class PuzzleGridCacheTests(GameTestCase):
+    def test_saved_board_is_not_served_from_stale_cache(self):
+        blank = self.game.initial_board.index('0')
+        name = f'({blank // 9},{blank % 9})'
+        self.client.get(f'/puzzles/{self.game.id}/')
+        self.client.post(f'/puzzles/{self.game.id}/save', {name: '7'})
+        response = self.client.get(f'/puzzles/{self.game.id}/')
+        self.assertContains(response, f'name="{name}" type="text" maxlength=1 value=\'7\'')
+
+# puzzles are generated in threads rather than the process pool
+@mock.patch('sudoku_app.views.getGenerationExecutor', lambda: ThreadPoolExecutor(1))
+class BatchCreateTests(GameTestCase):
+    def test_creates_count_puzzles_for_each_user(self):
+        other_user = User.objects.create_user('other', 'other@example.com', 'password')
+        response = self.client.post('/puzzles/create/medium/batch', {'count': 2})
+        self.assertEqual(response.json(), {'created': 2})
+        self.assertEqual(SudokuGame.objects.filter(user=self.user, difficulty='medium').count(), 2)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.post('/puzzles/create/easy/batch', {'count': 1, 'usernames': 'player,other'})
+        self.assertEqual(response.json(), {'created': 2})
+        self.assertEqual(SudokuGame.objects.filter(user=other_user).count(), 1)
+
+    @override_settings(BATCH_PUZZLE_LIMIT=5, BATCH_PUZZLE_TOTAL_LIMIT=6)
+    def test_rejects_invalid_batches(self):
+        self.assertEqual(self.client.post('/puzzles/create/weird/batch', {'count': 1}).status_code, 400)
+        self.assertEqual(self.client.post('/puzzles/create/easy/batch', {'count': 0}).status_code, 400)
+        self.assertEqual(self.client.post('/puzzles/create/easy/batch', {'count': 6}).status_code, 400)
+        self.assertEqual(self.client.post('/puzzles/create/easy/batch', {'count': 'x'}).status_code, 400)
+        # only staff can create puzzles for other users, who must exist, and the whole batch is bounded
+        self.assertEqual(self.client.post('/puzzles/create/easy/batch', {'usernames': 'player'}).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.post('/puzzles/create/easy/batch', {'usernames': 'player,nobody'}).status_code, 400)
+        self.assertEqual(self.client.post('/puzzles/create/easy/batch', {'count': 4, 'usernames': 'player,other'}).status_code, 400)
+        self.assertEqual(SudokuGame.objects.count(), 1)
+
+class PuzzlePoolTests(TestCase):
+    def test_entries_are_handed_out_once(self):
+        self.assertEqual(refillPool('easy', 2), 2)
+        self.assertEqual(refillPool('easy', 2), 0)
+        self.assertEqual(PuzzlePoolEntry.objects.filter(difficulty='easy').count(), 2)
+        entries = [takePoolEntry('easy') for _ in range(2)]
+        self.assertNotEqual(entries[0].id, entries[1].id)
+        self.assertIsNone(takePoolEntry('easy'))
+        self.assertFalse(PuzzlePoolEntry.objects.exists())
+
+    def test_claim_falls_back_to_generation(self):
+        puzzle_data = claimPuzzle('medium')
+        self.assertEqual(findSolutions(decodeBoard(puzzle_data['puzzle']), 2), [decodeBoard(puzzle_data['solution'])])
+        self.assertIsNone(puzzle_data['hash'])
+        refillPool('medium', 1)
+        entry = PuzzlePoolEntry.objects.get()
+        self.assertEqual(entry.canonical_hash, canonicalHash(decodeBoard(entry.initial_board)))
+        self.assertEqual(claimPuzzle('medium')['puzzle'], entry.initial_board)
+        self.assertFalse(PuzzlePoolEntry.objects.exists())
+
+# fallback generation runs in threads rather than the process pool
+@mock.patch('sudoku_app.pool.getGenerationExecutor', lambda: ThreadPoolExecutor(1))
+class CreatePuzzleAsyncTests(GameTestCase):
+    def test_anonymous_user_is_redirected_to_login(self):
+        self.client.logout()
+        response = self.client.get('/puzzles/create/easy/async')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('login', response['Location'])
+
+    def test_puzzle_is_claimed_from_pool(self):
+        refillPool('easy', 1)
+        entry = PuzzlePoolEntry.objects.get()
+        response = self.client.get('/puzzles/create/easy/async')
+        game = SudokuGame.objects.exclude(pk=self.game.pk).get(user=self.user)
+        self.assertRedirects(response, f'/puzzles/{game.id}', fetch_redirect_response=False)
+        self.assertEqual((game.initial_board, game.solution_board), (entry.initial_board, entry.solution_board))
+        self.assertFalse(PuzzlePoolEntry.objects.exists())
+
+    # each request of the WSGI app runs async views in a new event loop
+    @override_settings(ASYNC_GENERATION_CONCURRENCY=1)
+    def test_generation_semaphore_works_across_event_loops(self):
+        async def contend():
+            async def hold():
+                async with getGenerationSemaphore():
+                    await asyncio.sleep(0)
+            await asyncio.gather(hold(), hold())
+        asyncio.run(contend())
+        asyncio.run(contend())
+
+    @override_settings(ASYNC_GENERATION_TIMEOUT=0)
+    def test_generation_timeout_is_reported(self):
+        response = self.client.get('/puzzles/create/easy/async')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(SudokuGame.objects.count(), 1)
+
+@override_settings(REQUEST_TIMING=True, REQUEST_TIMING_LOG_EVERY=1000, MIDDLEWARE=['sudoku_app.middleware.RequestTimingMiddleware', *settings.MIDDLEWARE])
+class RequestTimingTests(GameTestCase):
+    def setUp(self):
+        super().setUp()
+        timing_samples.clear()
+        timing_counts.clear()
+
+    def test_requests_are_timed_per_view(self):
+        response = self.client.get(f'/puzzles/{self.game.id}/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=\d+\.\d, db;dur=\d+\.\d;desc="3 queries"$')
+        for _ in range(2):
+            self.client.get('/puzzles/')
+        self.user.is_staff = True
+        self.user.save()
+        views = self.client.get('/puzzles/timings').json()['views']
+        self.assertEqual((views['puzzle']['requests'], views['puzzles']['requests']), (1, 2))
+        self.assertEqual(views['puzzle']['queries'], {'p50': 3, 'p95': 3})
+        self.assertLessEqual(views['puzzles']['wall_ms']['p50'], views['puzzles']['wall_ms']['p95'])
+
+    def test_percentiles_of_recent_requests(self):
+        for wall_ms in range(100, 0, -1):
+            recordTiming('example', wall_ms, wall_ms % 10, wall_ms / 10)
+        summary = getTimingSummary()['example']
+        self.assertEqual(summary['requests'], 100)
+        self.assertEqual(summary['wall_ms'], {'p50': 51, 'p95': 95})
+        self.assertEqual(summary['queries'], {'p50': 5, 'p95': 9})
+
+class BoardFormTests(TestCase):
+    def test_cell_fields_and_board_field_agree(self):
+        puzzle, solution = generatePuzzle('easy', random.Random(0))
+        cells = {f'({i},{j})': str(solution[i * 9 + j]) for i in range(9) for j in range(9) if puzzle[i * 9 + j] == 0}
+        self.assertEqual(parseBoardForm(puzzle, cells), solution)
+        self.assertEqual(parseBoardForm(puzzle, {'board': encodeBoard(solution)}), solution)
+        # locked positions keep their initial value and invalid cells become blanks
+        locked, blank = next(pos for pos, val in enumerate(puzzle) if val), puzzle.index(0)
+        board = ['0'] * 81
+        board[locked], board[blank] = str(puzzle[locked] % 9 + 1), 'x'
+        self.assertEqual(parseBoardForm(puzzle, {'board': ''.join(board)}), puzzle)
+        self.assertEqual(parseBoardForm(puzzle, {f'({locked // 9},{locked % 9})': board[locked], f'({blank // 9},{blank % 9})': '12'}), puzzle)
+
+class BoardArrayTests(TestCase):
+    def test_stacked_boards_are_checked_one_by_one(self):
+        puzzle, solution = generatePuzzle('easy', random.Random(0))
+        blank = puzzle.index(0)
+        # the solution with one cell changed to the digit of the next cell in its row
+        wrong = list(solution)
+        neighbour = blank + 1 if blank % 9 < 8 else blank - 1
+        wrong[blank] = solution[neighbour]
+        boards = stackBoards([encodeBoard(board) for board in (puzzle, solution, wrong)])
+        self.assertEqual(isValidSolution(boards).tolist(), [False, True, False])
+        self.assertEqual(agreesWith(boards, boards[1]).tolist(), [True, True, False])
+        # the changed cell clashes with the cells holding the same digit in its row, column and box
+        peers = {pos for pos in range(81) if pos // 9 == blank // 9 or pos % 9 == blank % 9 or (pos // 27, pos % 9 // 3) == (blank // 27, blank % 9 // 3)}
+        clashes = {pos for pos in peers if wrong[pos] == wrong[blank]}
+        conflicts = findConflicts(boards)
+        self.assertFalse(conflicts[:2].any())
+        self.assertEqual(set(conflicts[2].reshape(81).nonzero()[0].tolist()), clashes)
+        self.assertEqual(findConflicts(boards[2]).tolist(), conflicts[2].tolist())
+
+class HintTests(GameTestCase):
+    def test_hint_fills_deducible_cell(self):
+        response = self.client.post(f'/puzzles/{self.game.id}/moves', {'moves': [], 'hint': True}, content_type='application/json')
+        hint = response.json()['hint']
+        self.assertIn(hint['technique'], ('naked single', 'hidden single'))
+        position = hint['row'] * 9 + hint['col']
+        self.assertEqual(hint['value'], int(self.game.solution_board[position]))
+        self.client.post(f'/puzzles/{self.game.id}/hint', {})
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.current_board[position], self.game.solution_board[position])
+
+    def test_no_hint_on_wrong_board(self):
+        blank = self.game.initial_board.index('0')
+        wrong = '1' if self.game.solution_board[blank] != '1' else '2'
+        response = self.client.post(f'/puzzles/{self.game.id}/hint', {f'({blank // 9},{blank % 9})': wrong})
+        self.assertEqual(response.status_code, 200)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.current_board.count('0'), self.game.initial_board.count('0') - 1)
+
+    def test_conflicts_are_returned_instead_of_hint(self):
+        blank = self.game.initial_board.index('0')
+        row = blank // 9
+        given = next(position for position in range(row * 9, row * 9 + 9) if self.game.initial_board[position] != '0')
+        move = {'row': row, 'col': blank % 9, 'value': int(self.game.initial_board[given])}
+        response = self.client.post(f'/puzzles/{self.game.id}/moves', {'moves': [move], 'hint': True}, content_type='application/json')
+        self.assertIsNone(response.json()['hint'])
+        self.assertEqual(sorted((cell['row'] * 9 + cell['col'] for cell in response.json()['conflicts'])), sorted([blank, given]))
+        # clearing the mistake makes hints available again
+        response = self.client.post(f'/puzzles/{self.game.id}/moves', {'moves': [dict(move, value=0)], 'hint': True}, content_type='application/json')
+        self.assertIsNotNone(response.json()['hint'])
+        self.assertEqual(response.json()['conflicts'], [])
+
+class SolveCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('player', 'player@example.com', 'password')
+
+    def solveGame(self, difficulty):
+        game = createGame(self.user, difficulty)
+        game.solved_at = timezone.now()
+        return game
+
+    def counts(self):
+        return UserSolveCount.objects.filter(user=self.user).values_list('easy_solved', 'medium_solved', 'hard_solved', 'total_solved').get()
+
+    def test_solves_are_counted_once(self):
+        game = self.solveGame('easy')
+        self.assertTrue(recordSolve(game))
+        self.assertFalse(recordSolve(game))
+        self.assertEqual(self.counts(), (1, 0, 0, 1))
+        # difficulties without a column of their own only count towards the total
+        game = self.solveGame('easy')
+        game.difficulty = 'expert'
+        recordSolve(game)
+        self.assertEqual(self.counts(), (1, 0, 0, 2))
+
+    def test_counts_are_rebuilt_from_records(self):
+        recordSolve(self.solveGame('easy'))
+        recordSolve(self.solveGame('hard'))
+        UserSolveCount.objects.all().delete()
+        self.assertEqual(rebuildSolveCounts(), 1)
+        self.assertEqual(self.counts(), (1, 0, 1, 2))
+        UserSolveCount.objects.filter(user=self.user).update(total_solved=10)
+        call_command('rebuild_solve_counts', stdout=io.StringIO())
+        self.assertEqual(self.counts(), (1, 0, 1, 2))
+
+# runs in transactions that commit, as the leaderboard is invalidated once a solve is committed
+class LeaderboardTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(f'player{i}', f'player{i}@example.com', 'password') for i in range(5)]
+        for user, total in zip(self.users, (3, 2, 2, 1)):
+            UserSolveCount.objects.create(user=user, total_solved=total)
+
+    def test_tied_users_share_rank_across_pages(self):
+        self.assertEqual(getLeaderboard(1, 2), {'rows': [(1, 'player0', 3), (2, 'player1', 2)], 'has_next': True})
+        self.assertEqual(getLeaderboard(2, 2), {'rows': [(2, 'player2', 2), (4, 'player3', 1)], 'has_next': False})
+        self.assertEqual(getUserRank(self.users[2]), (2, 2))
+        self.assertIsNone(getUserRank(self.users[4]))
+
+    def test_solve_invalidates_cached_leaderboard(self):
+        self.assertEqual(getLeaderboard(1, 25)['rows'][-1], (4, 'player3', 1))
+        self.assertIsNone(getUserRank(self.users[4]))
+        game = createGame(self.users[4])
+        game.solved_at = timezone.now()
+        recordSolve(game)
+        self.assertEqual(getLeaderboard(1, 25)['rows'][-1], (4, 'player4', 1))
+        self.assertEqual(getUserRank(self.users[4]), (4, 1))
+
+class GeneratorTests(TestCase):
+    def test_generated_puzzles_have_unique_solution(self):
+        rng = random.Random(0)
+        for difficulty in ('easy', 'medium', 'hard'):
+            puzzle, solution = generatePuzzle(difficulty, rng)
+            self.assertEqual(findSolutions(puzzle, 2), [solution])
+
+class RatingTests(TestCase):
+    def test_singles_only_puzzle(self):
+        puzzle = decodeBoard('003020600900305001001806400008102900700000008006708200002609500800203009005010300')
+        self.assertIn(ratePuzzle(puzzle)[1], ('naked single', 'hidden single'))
+
+    def test_x_wing_puzzle(self):
+        puzzle = decodeBoard('100000569492056108056109240009640801064010000218035604040500016905061402621000005')
+        self.assertEqual(ratePuzzle(puzzle)[1], 'x-wing')
+
+class CanonicalHashTests(TestCase):
+    def test_equivalent_puzzles_share_hash(self):
+        puzzle, _ = generatePuzzle('easy', random.Random(0))
+        rows = [puzzle[row * 9:row * 9 + 9] for row in range(9)]
+        # swap the first two bands, mirror the columns, transpose and swap digits 1 and 2
+        swapped = rows[3:6] + rows[0:3] + rows[6:9]
+        mirrored = [row[::-1] for row in swapped]
+        transposed = [[mirrored[row][col] for row in range(9)] for col in range(9)]
+        relabeled = [{1: 2, 2: 1}.get(val, val) for row in transposed for val in row]
+        self.assertEqual(canonicalHash(relabeled), canonicalHash(puzzle))
+
+    def test_different_puzzles_have_different_hashes(self):
+        rng = random.Random(0)
+        self.assertNotEqual(canonicalHash(generatePuzzle('easy', rng)[0]), canonicalHash(generatePuzzle('easy', rng)[0]))
+
+class SolveTimingTests(GameTestCase):
+    def setUp(self):
+        # drop events queued by other tests, whose game ids may be reused here
+        move_event_buffer.clear()
+        super().setUp()
+
+    def test_moves_are_logged_and_replayed(self):
+        blank = self.game.initial_board.index('0')
+        self.client.post(f'/puzzles/{self.game.id}/save', {f'({blank // 9},{blank % 9})': '7'})
+        self.game.refresh_from_db()
+        self.assertIsNotNone(self.game.first_move_at)
+        response = self.client.get(f'/puzzles/{self.game.id}/replay')
+        self.assertEqual([(move['row'] * 9 + move['col'], move['value']) for move in response.json()['moves']], [(blank, 7)])
+        self.assertEqual(MoveEvent.objects.filter(game_id=self.game.id).count(), 1)
+
+    # the board is saved before its events are inserted, so a failed insert is logged and the events stay queued,
+    # up to MOVE_EVENT_BUFFER_LIMIT of them
+    @override_settings(MOVE_EVENT_BATCH_SIZE=1, MOVE_EVENT_BUFFER_LIMIT=2)
+    def test_failed_flush_keeps_events_queued(self):
+        blanks = [pos for pos, char in enumerate(self.game.initial_board) if char == '0'][:3]
+        post_data = {}
+        with mock.patch.object(MoveEvent.objects, 'bulk_create', side_effect=DatabaseError), self.assertLogs('sudoku_app.events') as logs:
+            for pos in blanks:
+                post_data[f'({pos // 9},{pos % 9})'] = '7'
+                response = self.client.post(f'/puzzles/{self.game.id}/save', post_data)
+                self.assertEqual(response.status_code, 302)
+        self.assertEqual(SudokuGame.objects.get(pk=self.game.pk).current_board.count('7'), self.game.initial_board.count('7') + 3)
+        self.assertEqual([event.position for event in move_event_buffer], blanks[:2])
+        self.assertIn('WARNING:sudoku_app.events:move event buffer full, dropped 1 events', logs.output)
+        self.assertEqual(flushMoveEvents(), 2)
+
+    def test_solve_time_is_recorded(self):
+        post_data = {f'({position // 9},{position % 9})': value for position, value in enumerate(self.game.solution_board)}
+        self.client.post(f'/puzzles/{self.game.id}/check', post_data)
+        record = SudokuRecord.objects.get(puzzle_id=self.game.id)
+        self.assertGreaterEqual(record.solve_seconds, 0)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.solved_at, record.solved_at)
+        self.assertFalse(SudokuGame.objects.filter(user=self.user, solved_at__isnull=True).exists())
+        cache.clear()
+        response = self.client.get('/puzzles/statistics')
+        self.assertEqual(response.context['easy_median'], record.solve_seconds)
+        # medians are not recomputed after every solve
+        SudokuRecord.objects.filter(puzzle_id=self.game.id).update(solve_seconds=record.solve_seconds + 60)
+        invalidateLeaderboard()
+        response = self.client.get('/puzzles/statistics')
+        self.assertEqual(response.context['easy_median'], record.solve_seconds)
+
+class ConcurrentSaveTests(GameTestCase):
+    def setUp(self):
+        super().setUp()
+        blank = self.game.initial_board.index('0')
+        self.cell = f'({blank // 9},{blank % 9})'
+
+    def test_stale_form_is_not_saved(self):
+        self.client.post(f'/puzzles/{self.game.id}/save', {self.cell: '7', 'version': '0'})
+        response = self.client.post(f'/puzzles/{self.game.id}/save', {self.cell: '8', 'version': '0'})
+        self.assertEqual(response.status_code, 409)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.version, 1)
+        self.assertContains(response, f'name="{self.cell}" type="text" maxlength=1 value=\'7\'', status_code=409)
+
+    def test_moves_apply_on_top_of_other_saves(self):
+        self.client.post(f'/puzzles/{self.game.id}/save', {self.cell: '7', 'version': '0'})
+        row, col = (int(num) for num in self.cell[1:-1].split(','))
+        response = self.client.post(f'/puzzles/{self.game.id}/moves', {'moves': [{'row': row, 'col': col, 'value': 8}]}, content_type='application/json')
+        self.assertEqual(response.json()['version'], 2)
+
+    # the puzzle page posts the form with the version returned by its last batch of moves
+    def test_form_after_moves_uses_returned_version(self):
+        row, col = (int(num) for num in self.cell[1:-1].split(','))
+        response = self.client.post(f'/puzzles/{self.game.id}/moves', {'moves': [{'row': row, 'col': col, 'value': 7}]}, content_type='application/json')
+        version = response.json()['version']
+        response = self.client.post(f'/puzzles/{self.game.id}/save', {self.cell: '8', 'version': str(version)})
+        self.assertEqual(response.status_code, 302)
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.version, self.game.current_board[row * 9 + col]), (version + 1, '8'))
+
+class TransferTests(TestCase):
+    def test_export_import_round_trip(self):
+        user = User.objects.create_user('player', 'player@example.com', 'password')
+        game = createGame(user)
+        SudokuRecord.objects.create(puzzle_id=game.id, difficulty='easy', user=user, solve_seconds=12.5)
+        lines = list(exportLines())
+        SudokuGame.objects.all().delete()
+        SudokuRecord.objects.all().delete()
+        self.assertEqual(importLines(lines, chunk_size=1), {'games': 1, 'records': 1})
+        self.assertEqual(list(exportLines()), lines)
+
+class VerifyGamesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('player', 'player@example.com', 'password')
+
+    # game of the fixed puzzle with one cell of given board (blank in the puzzle, or given if not) changed
+    def changedGame(self, board, given=False):
+        game = createGame(self.user)
+        pos = next(pos for pos, char in enumerate(game.initial_board) if (char != '0') == given)
+        cells = list(getattr(game, board))
+        cells[pos] = str(int(game.solution_board[pos]) % 9 + 1)
+        setattr(game, board, ''.join(cells))
+        game.save()
+        return game
+
+    # {check: ids reported by verify_games}
+    def verify(self):
+        out = io.StringIO()
+        call_command('verify_games', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], f'Verified {SudokuGame.objects.count()} games')
+        report = {}
+        for line in lines[1:]:
+            check, _, ids = line.partition(': ')
+            report[check] = {int(game_id) for game_id in ids.partition(' (')[2].rstrip(')').split(', ') if game_id}
+        return report
+
+    def test_broken_games_are_reported(self):
+        good = createGame(self.user)
+        bad_solution = self.changedGame('solution_board')
+        changed_given = self.changedGame('current_board', given=True)
+        stale = createGame(self.user)
+        stale.solved_at = timezone.now()
+        stale.save()
+        report = self.verify()
+        self.assertEqual(report['invalid solution'], {bad_solution.id})
+        self.assertEqual(report['puzzle does not match solution'], set())
+        self.assertEqual(report['current board changed given numbers'], {changed_given.id})
+        self.assertEqual(report['solved_at out of date'], {stale.id})
+        self.assertEqual(report['solved without record'], set())
+        self.assertNotIn(good.id, set().union(*report.values()))
+
+class SolveServiceTests(TestCase):
+    def test_reports_number_of_solutions(self):
+        puzzle, solution = generatePuzzle('easy', random.Random(0))
+        boards = [encodeBoard(puzzle), '0' * 81, '11' + '0' * 79]
+        with ThreadPoolExecutor(1) as executor:
+            results = solveBoards(boards, executor)
+        self.assertEqual(results, [{'solutions': 1, 'solution': encodeBoard(solution)}, {'solutions': 2, 'solution': None}, {'solutions': 0, 'solution': None}])
+        with self.assertRaises(ValueError):
+            solveBoards(['123'])
+
+    def test_searches_past_node_limit_are_not_cached(self):
+        solve_cache.clear()
+        board = encodeBoard(generatePuzzle('hard', random.Random(0))[0])
+        with ThreadPoolExecutor(1) as executor:
+            self.assertEqual(solveBoard(board, executor, max_nodes=0), {'solutions': None, 'solution': None})
+            self.assertNotIn(board, solve_cache)
+            self.assertEqual(solveBoard(board, executor)['solutions'], 1)
+            self.assertIn(board, solve_cache)
+
+class SubmitPuzzleTests(GameTestCase):
+    def setUp(self):
+        super().setUp()
+        # verified puzzles are remembered by the solve service
+        solve_cache.clear()
+        self.puzzle, self.solution = generatePuzzle('medium', random.Random(0))
+
+    def test_unique_puzzle_becomes_custom_game(self):
+        text = '\n'.join(encodeBoard(self.puzzle)[row * 9:row * 9 + 9].replace('0', '.') for row in range(9))
+        response = self.client.post('/puzzles/submit', {'board': text})
+        game = SudokuGame.objects.get(user=self.user, custom=True)
+        self.assertRedirects(response, f'/puzzles/{game.id}', fetch_redirect_response=False)
+        self.assertTrue(game.custom)
+        self.assertEqual(game.solution_board, encodeBoard(self.solution))
+        self.assertEqual(game.canonical_hash, canonicalHash(self.puzzle))
+        # solving it is not counted on the leaderboard
+        self.client.post(f'/puzzles/{game.id}/check', {f'({i},{j})': str(self.solution[i * 9 + j]) for i in range(9) for j in range(9)})
+        self.assertFalse(SudokuRecord.objects.exists())
+
+    def test_rejects_puzzles_without_unique_solution(self):
+        # the first three rows of a solution leave many ways to fill in the rest
+        cells = {f'({i},{j})': str(self.solution[i * 9 + j]) for i in range(3) for j in range(9)}
+        self.assertEqual(self.client.post('/puzzles/submit', cells).status_code, 400)
+        conflicting = '55' + encodeBoard(self.puzzle)[2:]
+        self.assertEqual(self.client.post('/puzzles/submit', {'board': conflicting}).status_code, 400)
+        with override_settings(CUSTOM_PUZZLE_NODE_LIMIT=0):
+            self.assertEqual(self.client.post('/puzzles/submit', {'board': encodeBoard(self.puzzle)}).status_code, 400)
+        self.assertFalse(SudokuGame.objects.filter(custom=True).exists())
+
+# the replica is a second SQLite database holding a copy of the test database, added as an alias for this test only
+@no_event_flusher
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('player', 'player@example.com', 'password')
+        self.game = createGame(self.user)
+        self.client.force_login(self.user)
+        self.replica_dir = tempfile.TemporaryDirectory()
+        replica_name = os.path.join(self.replica_dir.name, 'replica.sqlite3')
+        connections['default'].ensure_connection()
+        with closing(sqlite3.connect(replica_name)) as replica:
+            connections['default'].connection.backup(replica)
+        connections.databases['replica1'] = dict(connections['default'].settings_dict, NAME=replica_name)
+
+    def tearDown(self):
+        connections['replica1'].close()
+        del connections['replica1']
+        del connections.databases['replica1']
+        self.replica_dir.cleanup()
+        move_event_buffer.clear()
+
+    # number of queries a request makes to the default database and to the replica
+    def queries(self, request):
+        with CaptureQueriesContext(connections['default']) as default, CaptureQueriesContext(connections['replica1']) as replica:
+            request()
+        return len(default), len(replica)
+
+    def test_reads_go_to_replica_until_user_writes(self):
+        self.assertEqual(self.queries(lambda: self.client.get('/puzzles/')), (0, 3))
+        # views that are not read-only always use the default database
+        self.assertEqual(self.queries(lambda: self.client.get(f'/puzzles/{self.game.id}/replay'))[1], 0)
+        blank = self.game.initial_board.index('0')
+        self.client.post(f'/puzzles/{self.game.id}/save', {f'({blank // 9},{blank % 9})': '7'})
+        self.assertEqual(self.queries(lambda: self.client.get(f'/puzzles/{self.game.id}/')), (3, 0))
+
+    # puzzles are created by GET requests, which redirect to the new puzzle
+    def test_created_puzzle_is_read_from_default(self):
+        response = self.client.get('/puzzles/create/easy/', follow=True)
+        game = SudokuGame.objects.exclude(pk=self.game.pk).get(user=self.user)
+        self.assertEqual(response.context['puzzle_id'], game.id)
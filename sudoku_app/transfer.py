@@ -0,0 +1,112 @@
+import gzip
+from itertools import islice
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from sudoku_app.models import SudokuGame, SudokuRecord
+
+# games and records are exported as tab separated lines, one row per line, in sections that start with a line naming
+# the section and its columns, e.g. "#games\tid\tusername\t..." (users are referred to by username so that data can
+# be moved between databases whose user ids differ), empty columns are None
+FORMAT_HEADER = '#sudoku-export\t1'
+SECTIONS = {
+    'games': (SudokuGame, ('id', 'username', 'difficulty', 'initial_board', 'current_board', 'solution_board', 'version', 'filled_count', 'rating', 'rating_technique', 'canonical_hash', 'created_at', 'first_move_at', 'solved_at', 'custom')),
+    'records': (SudokuRecord, ('puzzle_id', 'username', 'difficulty', 'solved_at', 'solve_seconds')),
+}
+
+# how columns that are not strings are read back
+PARSERS = {
+    'id': int,
+    'puzzle_id': int,
+    'version': int,
+    'filled_count': int,
+    'rating': int,
+    'solve_seconds': float,
+    'created_at': parse_datetime,
+    'first_move_at': parse_datetime,
+    'solved_at': parse_datetime,
+    'custom': lambda value: value == 'True',
+}
+
+# open export file for reading ('r') or writing ('w'), gzip compressed if its name ends in .gz
+def openTransferFile(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='ascii')
+    return open(path, mode, encoding='ascii')
+
+def formatValue(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+# lines of the export of every game and record, read from the database chunk_size rows at a time
+def exportLines(chunk_size=2000):
+    yield FORMAT_HEADER
+    for section, (model, fields) in SECTIONS.items():
+        yield '\t'.join(('#' + section,) + fields)
+        columns = ['user__username' if field == 'username' else field for field in fields]
+        rows = model.objects.order_by(fields[0]).values_list(*columns).iterator(chunk_size=chunk_size)
+        for row in rows:
+            yield '\t'.join(map(formatValue, row))
+
+# parse lines of an export into (section, row) pairs, where row maps field names to values
+def parseLines(lines):
+    lines = (line.rstrip('\n') for line in lines)
+    if next(lines, None) != FORMAT_HEADER:
+        raise ValueError('Not a sudoku export file')
+    section, fields = None, None
+    for line in lines:
+        if line.startswith('#'):
+            section, *fields = line[1:].split('\t')
+            if section not in SECTIONS or set(fields) != set(SECTIONS[section][1]):
+                raise ValueError(f'Unknown section {section}')
+            continue
+        values = line.split('\t')
+        if section is None or len(values) != len(fields):
+            raise ValueError(f'Malformed line: {line[:100]}')
+        yield section, {field: PARSERS.get(field, str)(value) if value != '' else None for field, value in zip(fields, values)}
+
+# ids of users with given usernames, looked up (or created with unusable passwords if create_users) as they are first seen
+# raises ValueError for unknown users otherwise
+def resolveUsers(usernames, user_ids, create_users):
+    missing = set(usernames) - user_ids.keys()
+    if missing:
+        user_ids.update(User.objects.filter(username__in=missing).values_list('username', 'id'))
+        missing -= user_ids.keys()
+    if missing and not create_users:
+        raise ValueError(f'Unknown users: {", ".join(sorted(missing)[:10])}')
+    for username in missing:
+        user = User(username=username)
+        user.set_unusable_password()
+        user.save()
+        user_ids[username] = user.id
+
+# import the rows of an export, each chunk_size rows inserted with bulk_create in their own transaction
+# rows whose id already exists are skipped if skip_existing (otherwise the import stops with an IntegrityError)
+# ids are kept, so records stay attached to their games, and the id sequences are moved past them afterwards
+# returns number of rows read for each section
+def importLines(lines, chunk_size=2000, create_users=False, skip_existing=False):
+    counts = {section: 0 for section in SECTIONS}
+    user_ids = {}
+    rows = parseLines(lines)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        resolveUsers({row['username'] for _, row in chunk}, user_ids, create_users)
+        objects = {section: [] for section in SECTIONS}
+        for section, row in chunk:
+            row['user_id'] = user_ids[row.pop('username')]
+            objects[section].append(SECTIONS[section][0](**row))
+        with transaction.atomic():
+            for section, section_objects in objects.items():
+                if section_objects:
+                    SECTIONS[section][0].objects.bulk_create(section_objects, ignore_conflicts=skip_existing)
+                    counts[section] += len(section_objects)
+    with connection.cursor() as cursor:
+        for statement in connection.ops.sequence_reset_sql(no_style(), [model for model, _ in SECTIONS.values()]):
+            cursor.execute(statement)
+    return counts
@@ -1,11 +1,22 @@
-from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse, HttpResponseRedirect
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.contrib.auth.views import redirect_to_login
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import require_POST
 from django.contrib.auth.models import User
-from sudoku_app.helper import generateSudoku, getLockedPositions, getErrors, fillCurrentBoard, addHint, getPuzzleStats, getLeaderboard, tryCreateUser
-from sudoku_app.models import SudokuGame, SudokuRecord
+from sudoku_app.helper import SAVE_ATTEMPTS, verifyCustomPuzzle, getCachedLockedPositions, getErrors, renderGrid, getPostedVersion, saveBoard, fillCurrentBoard, findHint, parseMoves, applyMoves, recordSolve, getReplay, getPuzzleStats, getMedianSolveTimes, getLeaderboard, getUserRank, tryCreateUser
+from sudoku_app.models import SudokuGame
 from sudoku_app.forms import UserForm
-import json
+from sudoku_app.pool import gameFromPuzzleData, claimPuzzle, claimPuzzleAsync, bulkCreatePuzzles, getGenerationExecutor
+from sudoku_app.middleware import getTimingSummary
+from sudoku_app.boards import decodeBoard, encodeBoard
+from sudoku_app.hints import getHintEngine, storeHintEngine, syncBoard
+from sudoku_app.boardarray import BoardArray, parseBoardText, parseBoardInputs
+import asyncio
 
 
 # Create your views here.
@@ -13,95 +24,241 @@ import json
 # display all of the current user's puzzles
 @login_required
 def puzzles(request):
-    # retrieve list of puzzles belonging to this current user from the table
-    puzzle_list = list(SudokuGame.objects.filter(user=request.user))
-    return render(request, 'sudoku_app/puzzles.html', {'puzzles': puzzle_list})
+    # retrieve one page of puzzles belonging to this current user, continuing after the puzzle id given as ?after=
+    # and only unsolved ones if ?unsolved=1 (only the columns needed to list them are loaded, the boards are not)
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        after = 0
+    unsolved = request.GET.get('unsolved') == '1'
+    puzzle_list = SudokuGame.objects.filter(user=request.user, id__gt=after)
+    if unsolved:
+        puzzle_list = puzzle_list.filter(solved_at__isnull=True)
+    # fetch one extra puzzle to find out if there is another page
+    puzzle_list = list(puzzle_list.order_by('id').only('id', 'difficulty', 'filled_count', 'solved_at')[:settings.PUZZLE_LIST_PAGE_SIZE + 1])
+    has_next = len(puzzle_list) > settings.PUZZLE_LIST_PAGE_SIZE
+    puzzle_list = puzzle_list[:settings.PUZZLE_LIST_PAGE_SIZE]
+    return render(request, 'sudoku_app/puzzles.html', {'puzzles': puzzle_list, 'after': after, 'unsolved': unsolved, 'next_after': puzzle_list[-1].id if has_next else None})
 
 # display the requested puzzle
 @login_required
 def puzzle(request, puzzle_id):
-    # retrieve requested puzzle and ensure that it belongs to current user
-    puzzle = get_object_or_404(SudokuGame, pk=puzzle_id)
-    if puzzle.user != request.user:
+    # retrieve requested puzzle, only if it belongs to current user
+    puzzle = SudokuGame.objects.filter(pk=puzzle_id, user=request.user).first()
+    if puzzle is None:
         return HttpResponseRedirect('/puzzles')
     # ensure that the solve has been recorded for leaderboard purposes
     if puzzle.is_solved():
-        SudokuRecord.objects.get_or_create(puzzle_id=puzzle_id, defaults={'difficulty': puzzle.difficulty, 'user': puzzle.user})
-    # load puzzle data into iterable format
-    initial_board_array, current_board_array, solution_board_array = json.loads(puzzle.initial_board), json.loads(puzzle.current_board), json.loads(puzzle.solution_board)
-    # send relevant data to view 
-    # (locked positions indicates what numbers were initially in the puzzle and can't be modified)
-    return render(request, 'sudoku_app/puzzle.html', {'puzzle': current_board_array, 'solution': solution_board_array, 'solved': puzzle.is_solved(), 'locked_positions': getLockedPositions(initial_board_array), 'puzzle_id': puzzle_id, 'difficulty': puzzle.difficulty})
+        recordSolve(puzzle)
+    # the grid only changes when the board is saved, so it is cached for each version of the board
+    cache_key = f'puzzle-grid:{puzzle_id}:{puzzle.version}'
+    grid = cache.get(cache_key)
+    if grid is None:
+        # (locked positions indicates what numbers were initially in the puzzle and can't be modified)
+        grid = renderGrid(decodeBoard(puzzle.current_board), getCachedLockedPositions(puzzle), None, puzzle.is_solved())
+        cache.set(cache_key, grid, settings.PUZZLE_CACHE_TIMEOUT)
+    return render(request, 'sudoku_app/puzzle.html', {'grid': grid, 'solved': puzzle.is_solved(), 'puzzle_id': puzzle_id, 'difficulty': puzzle.difficulty, 'version': puzzle.version})
 
 # create a puzzle for current user of given difficulty
 @login_required
 def create_puzzle(request, difficulty='easy'):
-    # create puzzle and corresponding solution from API
-    puzzle_data = generateSudoku(difficulty)
-    # serialize puzzle to store in database
-    initial_board_string, solution_board_string = json.dumps(puzzle_data['puzzle']), json.dumps(puzzle_data['solution'])
+    # claim pre-generated puzzle and corresponding solution (already encoded for the database)
+    puzzle_data = claimPuzzle(difficulty)
     # create instance of puzzle in database
-    sudoku_game = SudokuGame(initial_board=initial_board_string, current_board=initial_board_string, solution_board=solution_board_string, difficulty=difficulty, user=request.user)
+    sudoku_game = gameFromPuzzleData(puzzle_data, request.user, difficulty)
     sudoku_game.save()
     # display the puzzle that has just been created
     return HttpResponseRedirect(f'/puzzles/{sudoku_game.id}')
 
+# async variant of create_puzzle for the ASGI app, so a worker is not tied up while a puzzle is claimed or generated
+# (login_required does not support async views, so authentication is checked here)
+async def create_puzzle_async(request, difficulty='easy'):
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+    try:
+        puzzle_data = await claimPuzzleAsync(difficulty)
+    except asyncio.TimeoutError:
+        return HttpResponse('Puzzle generation timed out, try again', status=503)
+    # create instance of puzzle in database
+    sudoku_game = gameFromPuzzleData(puzzle_data, user, difficulty)
+    await sync_to_async(sudoku_game.save)()
+    # display the puzzle that has just been created
+    return HttpResponseRedirect(f'/puzzles/{sudoku_game.id}')
+
+# create a puzzle for current user from one they entered, either pasted as text or filled into an empty grid
+@login_required
+def submit_puzzle(request):
+    board, error = None, None
+    if request.method == 'POST':
+        # pasted text takes precedence over the grid
+        try:
+            board = BoardArray(parseBoardText(request.POST['board']) if request.POST.get('board', '').strip() else parseBoardInputs(request.POST))
+            puzzle_data = verifyCustomPuzzle(board)
+        except ValueError as e:
+            error = str(e)
+        else:
+            # create instance of puzzle in database
+            sudoku_game = gameFromPuzzleData(puzzle_data, request.user, puzzle_data['difficulty'], custom=True)
+            sudoku_game.save()
+            # display the puzzle that has just been created
+            return HttpResponseRedirect(f'/puzzles/{sudoku_game.id}')
+    # show the submitted board again so it can be corrected
+    board_array = board.toList() if board is not None else [0] * 81
+    grid = renderGrid(board_array, [False] * 81, None, False)
+    return render(request, 'sudoku_app/submit.html', {'grid': grid, 'error': error, 'text': request.POST.get('board', '')}, status=400 if error else 200)
+
+# create several puzzles of given difficulty at once, for current user or (staff only) for a list of users
+@login_required
+@require_POST
+def create_puzzles(request, difficulty='easy'):
+    if difficulty not in dict(SudokuGame.DIFFICULTIES):
+        return JsonResponse({'error': 'Unknown difficulty'}, status=400)
+    # number of puzzles per user must be between 1 and BATCH_PUZZLE_LIMIT
+    try:
+        count = int(request.POST.get('count', 1))
+    except ValueError:
+        count = 0
+    if not 1 <= count <= settings.BATCH_PUZZLE_LIMIT:
+        return JsonResponse({'error': f'count must be between 1 and {settings.BATCH_PUZZLE_LIMIT}'}, status=400)
+    usernames = [username for username in request.POST.get('usernames', '').split(',') if username]
+    if usernames and not request.user.is_staff:
+        return JsonResponse({'error': 'Only staff can create puzzles for other users'}, status=403)
+    # the puzzles are generated within this request, so the whole batch is bounded too
+    if count * max(len(set(usernames)), 1) > settings.BATCH_PUZZLE_TOTAL_LIMIT:
+        return JsonResponse({'error': f'At most {settings.BATCH_PUZZLE_TOTAL_LIMIT} puzzles can be created at once, use the create_puzzles command for larger batches'}, status=400)
+    users = list(User.objects.filter(username__in=usernames)) if usernames else [request.user]
+    if usernames and len(users) != len(set(usernames)):
+        return JsonResponse({'error': 'Unknown users'}, status=400)
+    created = bulkCreatePuzzles(getGenerationExecutor(), users, difficulty, count)
+    return JsonResponse({'created': created})
+
+# the board was changed by another request since the form was rendered, so the posted board is not saved
+# and the latest board is shown instead for the player to retry their changes on
+def render_conflict(request, puzzle):
+    puzzle.refresh_from_db()
+    grid = renderGrid(decodeBoard(puzzle.current_board), getCachedLockedPositions(puzzle), None, puzzle.is_solved())
+    context = {'grid': grid, 'solved': puzzle.is_solved(), 'puzzle_id': puzzle.id, 'difficulty': puzzle.difficulty, 'version': puzzle.version, 'conflict': True}
+    return render(request, 'sudoku_app/puzzle.html', context, status=409)
+
 # save current state of puzzle to database 
 @login_required
 def save_puzzle(request, puzzle_id):
-    # retrieve requested puzzle and ensure that it belongs to current user
-    puzzle = get_object_or_404(SudokuGame, pk=puzzle_id)
-    if puzzle.user != request.user:
+    # retrieve requested puzzle, only if it belongs to current user
+    puzzle = SudokuGame.objects.filter(pk=puzzle_id, user=request.user).first()
+    if puzzle is None:
         return HttpResponseRedirect('/puzzles')
     # populate current board given data sent from view (note: no data sent if puzzle has been solved already) and save in db
-    initial_board_array = json.loads(puzzle.initial_board)
-    current_board_array = fillCurrentBoard(initial_board_array, request.POST) if not puzzle.is_solved() else json.loads(puzzle.current_board)
-    puzzle.current_board = json.dumps(current_board_array)
-    puzzle.save()
+    initial_board_array = decodeBoard(puzzle.initial_board)
+    current_board_array = fillCurrentBoard(initial_board_array, request.POST) if not puzzle.is_solved() else decodeBoard(puzzle.current_board)
+    if not saveBoard(puzzle, encodeBoard(current_board_array), getPostedVersion(request.POST)):
+        return render_conflict(request, puzzle)
     # display requested puzzle
     return HttpResponseRedirect(f'/puzzles/{puzzle_id}')
 
 # check if current state of puzzle has any mistakes according to solution
 @login_required
 def check_puzzle(request, puzzle_id):
-    # retrieve requested puzzle and ensure that it belongs to current user
-    puzzle = get_object_or_404(SudokuGame, pk=puzzle_id)
-    if puzzle.user != request.user:
+    # retrieve requested puzzle, only if it belongs to current user
+    puzzle = SudokuGame.objects.filter(pk=puzzle_id, user=request.user).first()
+    if puzzle is None:
         return HttpResponseRedirect('/puzzles')
     # populate current board given data sent from view (note: no data sent if puzzle has been solved already) and save in db
-    initial_board_array, solution_board_array = json.loads(puzzle.initial_board), json.loads(puzzle.solution_board)
-    current_board_array = fillCurrentBoard(initial_board_array, request.POST) if not puzzle.is_solved() else json.loads(puzzle.current_board)
-    puzzle.current_board = json.dumps(current_board_array)
-    puzzle.save()   
+    initial_board_array, solution_board_array = decodeBoard(puzzle.initial_board), decodeBoard(puzzle.solution_board)
+    current_board_array = fillCurrentBoard(initial_board_array, request.POST) if not puzzle.is_solved() else decodeBoard(puzzle.current_board)
+    if not saveBoard(puzzle, encodeBoard(current_board_array), getPostedVersion(request.POST)):
+        return render_conflict(request, puzzle)
     # ensure that the solve has been recorded for leaderboard purposes
     if puzzle.is_solved():
-        SudokuRecord.objects.get_or_create(puzzle_id=puzzle_id, defaults={'difficulty': puzzle.difficulty, 'user': puzzle.user})
+        recordSolve(puzzle)
     # send relevant data to view 
     # (locked positions indicates what numbers were initially in the puzzle and can't be modified) 
     # (errors are calculated based on discrepencies between current and solution board)
-    return render(request, 'sudoku_app/puzzle.html', {'puzzle': current_board_array, 'solution': solution_board_array, 'solved': puzzle.is_solved(), 'locked_positions': getLockedPositions(initial_board_array), 'errors': getErrors(current_board_array, solution_board_array), 'puzzle_id': puzzle_id, 'difficulty': puzzle.difficulty})
+    grid = renderGrid(current_board_array, getCachedLockedPositions(puzzle), getErrors(current_board_array, solution_board_array), puzzle.is_solved())
+    return render(request, 'sudoku_app/puzzle.html', {'grid': grid, 'solved': puzzle.is_solved(), 'puzzle_id': puzzle_id, 'difficulty': puzzle.difficulty, 'version': puzzle.version})
 
 # add one number to current puzzle
 @login_required
 def add_hint(request, puzzle_id):
-    # retrieve requested puzzle and ensure that it belongs to current user
-    puzzle = get_object_or_404(SudokuGame, pk=puzzle_id)
-    if puzzle.user != request.user:
+    # retrieve requested puzzle, only if it belongs to current user
+    puzzle = SudokuGame.objects.filter(pk=puzzle_id, user=request.user).first()
+    if puzzle is None:
         return HttpResponseRedirect('/puzzles')
-    # populate current board given data sent from view (note: no data sent if puzzle has been solved already) and save in db
-    initial_board_array, solution_board_array = json.loads(puzzle.initial_board), json.loads(puzzle.solution_board)
-    current_board_array = addHint(fillCurrentBoard(initial_board_array, request.POST), solution_board_array) if not puzzle.is_solved() else json.loads(puzzle.current_board)
-    puzzle.current_board = json.dumps(current_board_array)
-    puzzle.save()
+    # solved puzzles have nothing left to hint
+    if puzzle.is_solved():
+        return HttpResponseRedirect(f'/puzzles/{puzzle_id}')
+    # populate current board given data sent from view and bring the puzzle's hint engine up to date with it
+    initial_board_array, solution_board_array = decodeBoard(puzzle.initial_board), decodeBoard(puzzle.solution_board)
+    current_board_array = fillCurrentBoard(initial_board_array, request.POST)
+    engine = getHintEngine(puzzle_id, puzzle.version, decodeBoard(puzzle.current_board), solution_board_array)
+    syncBoard(engine, current_board_array)
+    hint = findHint(engine, solution_board_array)
+    if hint is not None:
+        position, value, _ = hint
+        current_board_array[position] = value
+        engine.setValue(position, value)
+    if not saveBoard(puzzle, encodeBoard(current_board_array), getPostedVersion(request.POST)):
+        return render_conflict(request, puzzle)
+    storeHintEngine(puzzle_id, puzzle.version, engine)
+    # a board with mistakes gets no hint, the mistakes are shown instead like when checking the puzzle
+    if hint is None and not puzzle.is_solved():
+        grid = renderGrid(current_board_array, getCachedLockedPositions(puzzle), getErrors(current_board_array, solution_board_array), False)
+        return render(request, 'sudoku_app/puzzle.html', {'grid': grid, 'solved': False, 'puzzle_id': puzzle_id, 'difficulty': puzzle.difficulty, 'version': puzzle.version})
     # display requested puzzle
     return HttpResponseRedirect(f'/puzzles/{puzzle_id}')
 
+# apply a batch of cell changes sent by the puzzle page without reloading it
+@login_required
+@require_POST
+def apply_moves(request, puzzle_id):
+    # retrieve requested puzzle, only if it belongs to current user
+    puzzle = SudokuGame.objects.filter(pk=puzzle_id, user=request.user).first()
+    if puzzle is None:
+        return JsonResponse({'error': 'Puzzle not found'}, status=404)
+    try:
+        moves, requested = parseMoves(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid moves'}, status=400)
+    # update current board with moves (note: solved puzzles can no longer be modified) and save in db
+    # moves set cells to absolute values, so if another request saves the board first they are reapplied to its board
+    for _ in range(SAVE_ATTEMPTS):
+        initial_board_array, current_board_array = decodeBoard(puzzle.initial_board), decodeBoard(puzzle.current_board)
+        previous_version, previous_board_array = puzzle.version, list(current_board_array)
+        changed_positions = applyMoves(initial_board_array, current_board_array, moves) if not puzzle.is_solved() else []
+        if saveBoard(puzzle, encodeBoard(current_board_array)):
+            break
+        puzzle.refresh_from_db()
+    else:
+        return JsonResponse({'error': 'Puzzle is being changed elsewhere, try again', 'version': puzzle.version}, status=409)
+    # ensure that the solve has been recorded for leaderboard purposes
+    solved = puzzle.is_solved()
+    if solved and changed_positions:
+        recordSolve(puzzle)
+    # only send back the cells that changed (and which filled cells are wrong, if the client asked to check)
+    response_data = {'solved': solved, 'version': puzzle.version, 'changed': [{'row': position // 9, 'col': position % 9, 'value': current_board_array[position]} for position in changed_positions]}
+    if 'check' in requested:
+        errors = getErrors(current_board_array, decodeBoard(puzzle.solution_board))
+        response_data['errors'] = [{'row': position // 9, 'col': position % 9} for position in range(0, 81) if errors[position] and current_board_array[position] != 0]
+    # next hint without applying it (None if the board has mistakes, along with the entries that clash with another
+    # so the player has somewhere to start), the puzzle's hint engine is kept in step with each batch of moves so this
+    # does not rescan the board
+    if 'hint' in requested:
+        solution_board_array = decodeBoard(puzzle.solution_board)
+        engine = getHintEngine(puzzle_id, previous_version, previous_board_array, solution_board_array)
+        for position in changed_positions:
+            engine.setValue(position, current_board_array[position])
+        hint = findHint(engine, solution_board_array) if not solved else None
+        response_data['hint'] = {'row': hint[0] // 9, 'col': hint[0] % 9, 'value': hint[1], 'technique': hint[2]} if hint is not None else None
+        response_data['conflicts'] = [{'row': position // 9, 'col': position % 9} for position in engine.conflicts()]
+        storeHintEngine(puzzle_id, puzzle.version, engine)
+    return JsonResponse(response_data)
+
 # delete current puzzle
 @login_required
 def delete_puzzle(request, puzzle_id):
-    # retrieve requested puzzle and ensure that it belongs to current user
-    puzzle = get_object_or_404(SudokuGame, pk=puzzle_id)
-    if puzzle.user != request.user:
+    # retrieve requested puzzle, only if it belongs to current user
+    puzzle = SudokuGame.objects.filter(pk=puzzle_id, user=request.user).first()
+    if puzzle is None:
         return HttpResponseRedirect('/puzzles')
     # delete puzzle and redirect to home page
     puzzle.delete()
@@ -110,17 +267,24 @@ def delete_puzzle(request, puzzle_id):
 # reset current puzzle to initial board
 @login_required
 def reset_puzzle(request, puzzle_id):
-    # retrieve requested puzzle and ensure that it belongs to current user
-    puzzle = get_object_or_404(SudokuGame, pk=puzzle_id)
-    if puzzle.user != request.user:
+    # retrieve requested puzzle, only if it belongs to current user
+    puzzle = SudokuGame.objects.filter(pk=puzzle_id, user=request.user).first()
+    if puzzle is None:
         return HttpResponseRedirect('/puzzles')
     # reset puzzle to initial state
-    if not puzzle.is_solved():
-        puzzle.current_board = puzzle.initial_board
-    puzzle.save()
+    if not puzzle.is_solved() and not saveBoard(puzzle, puzzle.initial_board, getPostedVersion(request.POST)):
+        return render_conflict(request, puzzle)
     # display requested puzzle
     return HttpResponseRedirect(f'/puzzles/{puzzle_id}')
 
+# every move made to the puzzle so far, with the time it was made
+@login_required
+def puzzle_replay(request, puzzle_id):
+    puzzle = SudokuGame.objects.filter(pk=puzzle_id, user=request.user).first()
+    if puzzle is None:
+        return JsonResponse({'error': 'Puzzle not found'}, status=404)
+    return JsonResponse({'moves': [{'ms': ms, 'row': position // 9, 'col': position % 9, 'value': value} for ms, position, value in getReplay(puzzle)]})
+
 # create user that solve/save puzzles and view statistics
 def create_user(request):
     # GET request indicates page needs to be displayed, POST indicates that user is being created
@@ -145,13 +309,23 @@ def create_user(request):
 # display number of puzzles that current user has solved
 @login_required
 def display_stats(request):
-    return render(request, 'sudoku_app/statistics.html', getPuzzleStats(request.user))
+    stats = getPuzzleStats(request.user)
+    stats['in_progress'] = SudokuGame.objects.filter(user=request.user, solved_at__isnull=True).count()
+    stats.update({f'{difficulty}_median': median for difficulty, median in getMedianSolveTimes().items()})
+    return render(request, 'sudoku_app/statistics.html', stats)
 
-# display how many puzzles each registered user has solved
+# display one page of how many puzzles each registered user has solved, along with current user's rank
 @login_required
 def display_leaderboard(request):
-    return render(request, 'sudoku_app/leaderboard.html', {"scores": getLeaderboard()})
-
-
-
+    # invalid page numbers fall back to first page
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    leaderboard = getLeaderboard(page, settings.LEADERBOARD_PAGE_SIZE)
+    return render(request, 'sudoku_app/leaderboard.html', {'scores': leaderboard['rows'], 'page': page, 'has_next': leaderboard['has_next'], 'user_rank': getUserRank(request.user)})
 
+# display percentiles of per view timings recorded by RequestTimingMiddleware (when enabled)
+@staff_member_required
+def display_timings(request):
+    return JsonResponse({'enabled': settings.REQUEST_TIMING, 'views': getTimingSummary()})
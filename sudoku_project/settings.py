@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 
 from pathlib import Path
 import os
+from urllib.parse import urlparse
 import django_heroku
 import dj_database_url
 import dotenv
@@ -56,8 +57,15 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'sudoku_app.middleware.ReplicaRoutingMiddleware',
 ]
 
+# Opt-in per view timing (see sudoku_app/middleware.py), outermost so it also times the other middleware
+REQUEST_TIMING = os.getenv('REQUEST_TIMING') == 'True'
+REQUEST_TIMING_LOG_EVERY = int(os.getenv('REQUEST_TIMING_LOG_EVERY', 100))
+if REQUEST_TIMING:
+    MIDDLEWARE.insert(0, 'sudoku_app.middleware.RequestTimingMiddleware')
+
 ROOT_URLCONF = 'sudoku_project.urls'
 
 TEMPLATES = [
@@ -82,8 +90,22 @@ WSGI_APPLICATION = 'sudoku_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# SSL can be turned off for local databases (e.g. DATABASE_URL=sqlite:///db.sqlite3 DATABASE_SSL_REQUIRE=False)
 DATABASES = {}
-DATABASES['default'] = dj_database_url.config(conn_max_age=600, ssl_require=True)
+DATABASES['default'] = dj_database_url.config(conn_max_age=600, ssl_require=os.getenv('DATABASE_SSL_REQUIRE', 'True') == 'True')
+
+# Read replicas of the default database as a comma separated list of urls (e.g. DATABASE_REPLICA_URLS=postgres://...,postgres://...),
+# added as replica1, replica2, ... and used by the read-only views (see sudoku_app/routers.py and sudoku_app/middleware.py)
+# after a user writes, their reads stay on the default database for REPLICA_STICKY_SECONDS so they see their own changes
+DATABASE_REPLICAS = []
+for replica_url in filter(None, os.getenv('DATABASE_REPLICA_URLS', '').split(',')):
+    replica_alias = f'replica{len(DATABASE_REPLICAS) + 1}'
+    DATABASES[replica_alias] = dj_database_url.parse(replica_url, conn_max_age=600, ssl_require=os.getenv('DATABASE_SSL_REQUIRE', 'True') == 'True')
+    # tests run against the default test database only
+    DATABASES[replica_alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(replica_alias)
+DATABASE_ROUTERS = ['sudoku_app.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -131,8 +153,69 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 LOGOUT_REDIRECT_URL='/accounts/login'
 
-# Activate Django-Heroku.
-django_heroku.settings(locals())
+# Puzzle pool configuration (see sudoku_app/pool.py)
+
+PUZZLE_POOL_WATERMARK = int(os.getenv('PUZZLE_POOL_WATERMARK', 50))
+PUZZLE_POOL_REFILL_INTERVAL = float(os.getenv('PUZZLE_POOL_REFILL_INTERVAL', 5))
+
+# Puzzle generation for async puzzle creation when the pool is empty (see claimPuzzleAsync)
+
+ASYNC_GENERATION_WORKERS = int(os.getenv('ASYNC_GENERATION_WORKERS', 2))
+ASYNC_GENERATION_CONCURRENCY = int(os.getenv('ASYNC_GENERATION_CONCURRENCY', 8))
+ASYNC_GENERATION_TIMEOUT = float(os.getenv('ASYNC_GENERATION_TIMEOUT', 5))
+
+# Maximum number of puzzles per user, and in total, that can be requested from the batch creation endpoint
+# (they are generated within the request, larger batches are left to the create_puzzles command)
+
+BATCH_PUZZLE_LIMIT = int(os.getenv('BATCH_PUZZLE_LIMIT', 100))
+BATCH_PUZZLE_TOTAL_LIMIT = int(os.getenv('BATCH_PUZZLE_TOTAL_LIMIT', 100))
+
+# Solve service processes, and number of solved boards kept in memory (see sudoku_app/solveservice.py)
+
+SOLVER_WORKERS = int(os.getenv('SOLVER_WORKERS', 2))
+SOLVE_CACHE_SIZE = int(os.getenv('SOLVE_CACHE_SIZE', 10000))
+
+# Most search nodes spent verifying that a submitted puzzle has a unique solution (about 200,000 are searched a second)
+
+CUSTOM_PUZZLE_NODE_LIMIT = int(os.getenv('CUSTOM_PUZZLE_NODE_LIMIT', 100000))
+
+# Cache shared by every worker, e.g. CACHE_URL=db://cache_table (after manage.py createcachetable cache_table) or
+# CACHE_URL=memcached://host:11211 (needs python-memcached)
+# without it each worker process has its own in-memory cache, and invalidating cached pages is best-effort: only the
+# worker that recorded a solve drops its cached leaderboard, the others serve theirs until LEADERBOARD_CACHE_TIMEOUT
+cache_url = urlparse(os.getenv('CACHE_URL', ''))
+if cache_url.scheme == 'db':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': cache_url.netloc}}
+elif cache_url.scheme == 'memcached':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache', 'LOCATION': cache_url.netloc}}
+
+# Seconds that rendered puzzle grids are cached for
+
+PUZZLE_CACHE_TIMEOUT = int(os.getenv('PUZZLE_CACHE_TIMEOUT', 3600))
+
+# Number of puzzles listed per page
+
+PUZZLE_LIST_PAGE_SIZE = int(os.getenv('PUZZLE_LIST_PAGE_SIZE', 50))
+
+# Leaderboard configuration
+
+LEADERBOARD_PAGE_SIZE = int(os.getenv('LEADERBOARD_PAGE_SIZE', 25))
+LEADERBOARD_CACHE_TIMEOUT = int(os.getenv('LEADERBOARD_CACHE_TIMEOUT', 30))
+
+# Seconds that median solve times are cached for (they are not invalidated by solves, one more solve barely moves them)
+
+MEDIAN_SOLVE_TIMES_CACHE_TIMEOUT = int(os.getenv('MEDIAN_SOLVE_TIMES_CACHE_TIMEOUT', 300))
+
+# Move events are buffered in memory and inserted in batches of MOVE_EVENT_BATCH_SIZE by a background thread,
+# at least every MOVE_EVENT_FLUSH_INTERVAL seconds (0 turns the thread off, see sudoku_app/events.py)
+# at most MOVE_EVENT_BUFFER_LIMIT events are kept while inserts fail, later events are dropped
+
+MOVE_EVENT_BATCH_SIZE = int(os.getenv('MOVE_EVENT_BATCH_SIZE', 500))
+MOVE_EVENT_FLUSH_INTERVAL = float(os.getenv('MOVE_EVENT_FLUSH_INTERVAL', 2))
+MOVE_EVENT_BUFFER_LIMIT = int(os.getenv('MOVE_EVENT_BUFFER_LIMIT', 10000))
+
+# Activate Django-Heroku (databases are configured above).
+django_heroku.settings(locals(), databases=False)
 
 
 